@@ -0,0 +1,41 @@
+import os
+import sys
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from card_renderer import render_card
+from card_pipeline import FORMATS, DEFAULT_QUALITY, encode_card
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare card output encodings")
+    parser.add_argument("templates", nargs="*",
+                        default=[os.path.join(ROOT, "cake_template.png"),
+                                 os.path.join(ROOT, "cake_template4.png")])
+    parser.add_argument("--quality", type=int, default=DEFAULT_QUALITY)
+    parser.add_argument("--max-dim", type=int, action="append",
+                        help="dimension caps to compare (repeatable, default: none and 800)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+    caps = args.max_dim or [None, 800]
+
+    print(f"{'template':<20} {'format':<6} {'max dim':>7} {'KB':>8} {'vs png':>7} {'encode ms':>10}")
+    for template in args.templates:
+        img = render_card("Siri Darsh", template, base_width=800, outline_width=2)
+        baseline = len(encode_card(img, "png"))
+        for max_dim in caps:
+            for fmt in FORMATS:
+                best = float("inf")
+                for _ in range(args.repeat):
+                    start = time.perf_counter()
+                    data = encode_card(img, fmt, args.quality, max_dim)
+                    best = min(best, (time.perf_counter() - start) * 1000)
+                print(f"{os.path.basename(template):<20} {fmt:<6} {max_dim or '-':>7} "
+                      f"{len(data) / 1024:>8.0f} {len(data) / baseline:>6.0%} {best:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
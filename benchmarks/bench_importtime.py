@@ -0,0 +1,81 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+from datetime import date
+
+from synthetic import write_contacts
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def import_breakdown(module):
+    """Run ``python -X importtime`` on a module; return [(cumulative us, self us, depth, name)]"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"],
+                            cwd=ROOT, capture_output=True, text=True, check=True)
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        if not self_us.strip().isdigit():
+            continue
+        depth = (len(name) - len(name.lstrip())) // 2
+        rows.append((int(cumulative_us), int(self_us), depth, name.strip()))
+    return rows
+
+
+def time_empty_run(count, repeat):
+    """Best wall time of a full CLI run on a day with no birthdays"""
+    with tempfile.TemporaryDirectory() as tmp:
+        write_contacts(os.path.join(tmp, "contacts.csv"), count, skip=date.today())
+        best = float("inf")
+        for _ in range(repeat):
+            start = time.perf_counter()
+            subprocess.run([sys.executable, os.path.join(ROOT, "birthday_automation.py")],
+                           cwd=tmp, stdin=subprocess.DEVNULL, stdout=subprocess.DEVNULL, check=True)
+            best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure CLI cold-start cost")
+    parser.add_argument("--module", default="birthday_automation")
+    parser.add_argument("--top", type=int, default=15, help="slowest imports to list")
+    parser.add_argument("--contacts", type=int, default=1000,
+                        help="contacts in the no-birthdays run")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-ms", type=float, default=None,
+                        help="exit non-zero if importing the module takes longer than this")
+    parser.add_argument("--forbid", action="append", default=None,
+                        help="modules that must not be imported at startup "
+                             "(repeatable, default: pandas, numpy, PIL, pywhatkit)")
+    args = parser.parse_args()
+    forbidden = args.forbid or ["pandas", "numpy", "PIL", "pywhatkit"]
+
+    # Take the fastest of several runs; the OS cache makes the first one noisy
+    runs = [import_breakdown(args.module) for _ in range(args.repeat)]
+    rows = min(runs, key=lambda rows: rows[-1][0])
+    total_ms = rows[-1][0] / 1000
+
+    print(f"{'cumulative ms':>13} {'self ms':>8}  module")
+    for cumulative_us, self_us, depth, name in sorted(rows, reverse=True)[:args.top]:
+        print(f"{cumulative_us / 1000:>13.1f} {self_us / 1000:>8.1f}  {'  ' * depth}{name}")
+    print(f"\nimport {args.module}: {total_ms:.1f} ms")
+
+    loaded = {name.split(".")[0] for _, _, _, name in rows}
+    leaked = sorted(loaded.intersection(forbidden))
+    if leaked:
+        print(f"Heavy modules imported at startup: {', '.join(leaked)}")
+
+    seconds = time_empty_run(args.contacts, args.repeat)
+    print(f"no-birthdays run with {args.contacts} contacts: {seconds * 1000:.0f} ms wall")
+
+    if leaked or (args.budget_ms is not None and total_ms > args.budget_ms):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+import os
+import sys
+import time
+import argparse
+
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from card_renderer import draw_outlined_text, load_font
+
+MESSAGE = "Happy Birthday\nSiri Darsh!"
+
+
+def legacy_outline(draw, xy, text, font, outline_width):
+    """The old nested-offset outline: one glyph pass per offset plus the fill"""
+    x, y = xy
+    for offset_x in range(-outline_width, outline_width + 1):
+        for offset_y in range(-outline_width, outline_width + 1):
+            if offset_x != 0 or offset_y != 0:
+                draw.text((x + offset_x, y + offset_y), text,
+                          fill="black", font=font, align="center")
+    draw.text((x, y), text, fill="white", font=font, align="center")
+
+
+def stroked_outline(draw, xy, text, font, outline_width):
+    draw_outlined_text(draw, xy, text, font, outline_width=outline_width)
+
+
+def time_render(render, width, height, outline_width, repeat):
+    """Return the best time in ms to draw the outlined message on a blank template"""
+    base = Image.new("RGBA", (width, height), (120, 60, 160, 255))
+    font = load_font("arial.ttf", int(60 * width / 800))
+    best = float("inf")
+    for _ in range(repeat):
+        img = base.copy()
+        draw = ImageDraw.Draw(img)
+        start = time.perf_counter()
+        render(draw, (width // 6, height // 3), MESSAGE, font, outline_width)
+        best = min(best, (time.perf_counter() - start) * 1000)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare outline text renderers")
+    parser.add_argument("--outline-width", type=int, default=2)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'template':>12} {'legacy ms':>10} {'stroke ms':>10} {'speedup':>8}")
+    for width, height in [(400, 300), (900, 572), (1000, 1333), (2000, 2666)]:
+        legacy = time_render(legacy_outline, width, height, args.outline_width, args.repeat)
+        stroke = time_render(stroked_outline, width, height, args.outline_width, args.repeat)
+        print(f"{width:>5}x{height:<6} {legacy:>10.2f} {stroke:>10.2f} {legacy / stroke:>7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
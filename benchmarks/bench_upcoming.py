@@ -0,0 +1,94 @@
+import os
+import sys
+import time
+import argparse
+import calendar
+from datetime import date
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from contact_index import DAYS_IN_INDEX, FEB_29, BirthdayIndex, month_day
+
+
+def days_until_next(ordinals, today):
+    """Vectorized days from today until each birthday's next occurrence
+
+    The whole-array scan the bucket index is measured against.
+    ``ordinals`` is a numpy array of birthday ordinals; entries of -1 (no
+    valid birthday) come back as -1. Birthdays today are 0 days away, and
+    29-Feb falls on 28-Feb in non-leap years.
+    """
+    ordinals = np.asarray(ordinals, dtype=np.int32)
+
+    def day_of_year(year):
+        if calendar.isleap(year):
+            return ordinals
+        return ordinals - (ordinals >= FEB_29)
+
+    year_length = 366 if calendar.isleap(today.year) else 365
+    today_doy = today.timetuple().tm_yday - 1
+    this_year = day_of_year(today.year)
+    next_year = day_of_year(today.year + 1)
+    days = np.where(this_year >= today_doy,
+                    this_year - today_doy,
+                    year_length - today_doy + next_year)
+    return np.where(ordinals >= 0, days, -1)
+
+
+def upcoming_positions(ordinals, today, days, limit=None):
+    """Return (positions, days_until) for birthdays within the next N days
+
+    Only the matching rows are sorted; with a limit, ``argpartition``
+    selects the nearest ``limit`` rows before sorting. Ties keep row order.
+    """
+    until = days_until_next(ordinals, today)
+    candidates = np.flatnonzero((until >= 0) & (until <= days))
+    if limit is not None and limit < len(candidates):
+        nearest = np.argpartition(until[candidates], limit - 1)[:limit]
+        candidates = np.sort(candidates[nearest])
+    order = candidates[np.argsort(until[candidates], kind="stable")]
+    return order, until[order]
+
+
+def best_of(func, repeat):
+    """Return the fastest of several runs in milliseconds"""
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append((time.perf_counter() - start) * 1000)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the upcoming-birthdays window")
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--days", type=int, default=30)
+    parser.add_argument("--repeat", type=int, default=7)
+    parser.add_argument("--budget-ms", type=float, default=100.0)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    ordinals = rng.integers(0, DAYS_IN_INDEX, size=args.rows, dtype=np.int32)
+    today = date.today()
+
+    scan_ms = best_of(lambda: upcoming_positions(ordinals, today, args.days), args.repeat)
+    scan_top_ms = best_of(lambda: upcoming_positions(ordinals, today, args.days, limit=100), args.repeat)
+
+    index = BirthdayIndex(f"{month:02d}-{day:02d}" for month, day in map(month_day, ordinals.tolist()))
+    window_ms = best_of(lambda: index.upcoming(today, args.days), args.repeat)
+    top_ms = best_of(lambda: index.upcoming(today, args.days, limit=100), args.repeat)
+    positions, _ = index.upcoming(today, args.days)
+
+    print(f"rows:                {args.rows:,}")
+    print(f"matches:             {len(positions):,} within {args.days} days")
+    print(f"numpy scan:          {scan_ms:.1f} ms (top 100: {scan_top_ms:.1f} ms)")
+    print(f"day buckets:         {window_ms:.1f} ms (top 100: {top_ms:.2f} ms)")
+    if window_ms > args.budget_ms:
+        print(f"FAIL: over the {args.budget_ms:.0f} ms budget")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,232 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import statistics
+import subprocess
+from datetime import date, datetime
+
+from synthetic import SIZES, parse_size, write_contacts
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Rows a viewer window asks for after each query
+PAGE = 50
+# What a user types into the contacts search box, one keystroke at a time
+TYPED = "parker"
+CARD_FORMATS = ("png", "jpeg", "webp")
+CONTACT_CASES = ("first_refresh", "today", "today_cli", "search", "sort", "upcoming")
+FIXED_CASES = ("card_render", "card_encode", "send_dispatch")
+
+
+def measure(func, repeat, setup=None):
+    """Time ``func`` ``repeat`` times; ``setup()`` runs untimed before each call and feeds it"""
+    timings = []
+    for _ in range(repeat):
+        args = (setup(),) if setup else ()
+        start = time.perf_counter()
+        func(*args)
+        timings.append((time.perf_counter() - start) * 1000)
+    return {"best_ms": round(min(timings), 3), "median_ms": round(statistics.median(timings), 3)}
+
+
+def contacts_file(data_dir, label, rows, seed, backend):
+    """Generate (or reuse) the synthetic contacts for one size and backend"""
+    csv_path = os.path.join(data_dir, f"contacts-{label}-{seed}.csv")
+    if not os.path.exists(csv_path):
+        write_contacts(csv_path, rows, seed, timezones=True)
+    if backend == "csv":
+        return csv_path
+    from contact_db import migrate
+
+    db_path = os.path.join(data_dir, f"contacts-{label}-{seed}.db")
+    if not os.path.exists(db_path):
+        migrate(csv_path, db_path)
+    return db_path
+
+
+def contact_cases(path, day):
+    """The contact-store work behind the viewer's refresh_all, _filter_contacts,
+    _refresh_upcoming and sorting, and the CLI's today lookup"""
+    from contact_store import open_store, read_birthdays
+
+    def first_refresh():
+        # Opening the viewer: parse or connect, then fill every tab
+        store = open_store(path)
+        store.birthdays_on(day)
+        store.upcoming(day, 30)
+        store.query("").rows(0, PAGE)
+
+    def warm_store():
+        store = open_store(path)
+        store.birthdays_on(day)
+        store.query("").rows(0, PAGE)
+        return store
+
+    def search(store):
+        for end in range(1, len(TYPED) + 1):
+            store.query(TYPED[:end]).rows(0, PAGE)
+
+    return {
+        "first_refresh": (first_refresh, None),
+        "today": (lambda store: store.birthdays_on(day), warm_store),
+        "today_cli": (lambda: read_birthdays(path, day), None),
+        "search": (search, warm_store),
+        "sort": (lambda store: store.query("", "name").rows(0, PAGE), warm_store),
+        "upcoming": (lambda store: store.upcoming(day, 30), warm_store),
+    }
+
+
+def fixed_cases(server, messages, concurrency):
+    """Card and send benchmarks, whose cost does not depend on the contact count"""
+    from card_renderer import render_card
+    from card_pipeline import Card, encode_card
+    from dispatcher import Dispatcher, SendJob
+    from transports import HttpTransport
+
+    template = os.path.join(ROOT, "cake_template.png")
+    render = lambda: render_card("Siri Darsh", template, base_width=800, outline_width=2)
+    img = render()
+
+    def encode():
+        for fmt in CARD_FORMATS:
+            encode_card(img, fmt)
+
+    card = Card("Siri Darsh", encode_card(img, "jpeg"), "jpeg")
+    jobs = [SendJob(f"+1555{i:07d}", "Happy Birthday!", card) for i in range(messages)]
+
+    def send():
+        dispatcher = Dispatcher(HttpTransport(server.url), concurrency=concurrency)
+        results = dispatcher.dispatch(jobs)
+        if not all(result.ok for result in results):
+            raise RuntimeError("the fake provider rejected a message")
+
+    return {
+        "card_render": (render, None),
+        "card_encode": (encode, None),
+        "send_dispatch": (send, None),
+    }
+
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT,
+                                capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return result.stdout.strip()
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """Mark each result against the baseline run; returns the regressed ones"""
+    previous = {(r["case"], r["size"]): r for r in baseline.get("results", [])}
+    regressions = []
+    for result in results:
+        old = previous.get((result["case"], result["size"]))
+        if old is None:
+            continue
+        result["baseline_ms"] = old["best_ms"]
+        result["change"] = round(result["best_ms"] / old["best_ms"] - 1, 3) if old["best_ms"] else None
+        slower = result["best_ms"] - old["best_ms"]
+        result["regression"] = slower > min_delta_ms and slower > old["best_ms"] * tolerance
+        if result["regression"]:
+            regressions.append(result)
+    return regressions
+
+
+def print_results(results):
+    print(f"{'case':<14} {'size':>6} {'best ms':>10} {'median ms':>10} {'baseline':>10} {'change':>8}")
+    for r in results:
+        baseline = f"{r['baseline_ms']:.1f}" if "baseline_ms" in r else "-"
+        change = f"{r['change']:+.0%}" if r.get("change") is not None else "-"
+        flag = "  REGRESSION" if r.get("regression") else ""
+        print(f"{r['case']:<14} {r['size']:>6} {r['best_ms']:>10.1f} {r['median_ms']:>10.1f} "
+              f"{baseline:>10} {change:>8}{flag}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the contact, card and send hot paths")
+    parser.add_argument("--sizes", default=",".join(SIZES),
+                        help="contact counts to run, named (1k, 100k, 1m) or numeric (default: all)")
+    parser.add_argument("--cases", default=None,
+                        help=f"comma-separated cases to run (default: all of "
+                             f"{', '.join(CONTACT_CASES + FIXED_CASES)})")
+    parser.add_argument("--backend", choices=("csv", "sqlite"), default="csv")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--data-dir", default=None,
+                        help="keep generated contacts here between runs (default: a temp dir)")
+    parser.add_argument("--messages", type=int, default=200, help="messages per send_dispatch run")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--output", default="benchmark_results.json")
+    parser.add_argument("--baseline", default=None, help="earlier results JSON to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="slowdown over the baseline flagged as a regression (default: 0.2 = 20%%)")
+    parser.add_argument("--min-delta-ms", type=float, default=1.0,
+                        help="ignore slowdowns smaller than this, which are mostly noise")
+    args = parser.parse_args()
+
+    wanted = set(args.cases.split(",")) if args.cases else set(CONTACT_CASES + FIXED_CASES)
+    unknown = wanted.difference(CONTACT_CASES + FIXED_CASES)
+    if unknown:
+        parser.error(f"unknown case(s): {', '.join(sorted(unknown))}")
+    day = date.today()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        data_dir = args.data_dir or tmp
+        os.makedirs(data_dir, exist_ok=True)
+        for label, rows in (parse_size(size) for size in args.sizes.split(",")):
+            if not wanted.intersection(CONTACT_CASES):
+                break
+            print(f"Preparing {rows:,} contacts...", file=sys.stderr)
+            path = contacts_file(data_dir, label, rows, args.seed, args.backend)
+            for case, (func, setup) in contact_cases(path, day).items():
+                if case in wanted:
+                    results.append({"case": case, "size": label, "rows": rows,
+                                    **measure(func, args.repeat, setup)})
+
+    fixed = [case for case in FIXED_CASES if case in wanted]
+    if fixed:
+        from transports import FakeServer
+
+        with FakeServer(latency=0.0, jitter=0.0) as server:
+            for case, (func, setup) in fixed_cases(server, args.messages, args.concurrency).items():
+                if case in wanted:
+                    results.append({"case": case, "size": "-", "rows": None,
+                                    **measure(func, args.repeat, setup)})
+
+    report = {
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "backend": args.backend,
+        "repeat": args.repeat,
+        "seed": args.seed,
+        "results": results,
+    }
+    regressions = []
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(results, json.load(f), args.tolerance, args.min_delta_ms)
+        report["baseline"] = args.baseline
+        report["regressions"] = [f"{r['case']}[{r['size']}]" for r in regressions]
+
+    print_results(results)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nResults written to {args.output}")
+    if regressions:
+        print(f"{len(regressions)} regression(s) over {args.tolerance:.0%}: "
+              f"{', '.join(report['regressions'])}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import os
+import sys
+import csv
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from contact_index import DAYS_IN_MONTH, MONTH_ABBRS
+
+# Named sizes the suite runs at
+SIZES = {"1k": 1_000, "100k": 100_000, "1m": 1_000_000}
+
+FIRST_NAMES = ["Srini", "Siri", "Darsh", "Jesus", "Abhishay", "Sarah", "Maria", "Wei", "Aisha",
+               "Olu", "Priya", "James", "Chen", "Fatima", "Lucas", "Emma", "Noah", "Ana",
+               "Yuki", "Omar", "Ravi", "Sofia", "Ivan", "Mei", "Diego", "Zara", "Kofi", "Lena"]
+LAST_NAMES = ["Parker", "Kumar", "Garcia", "Smith", "Nguyen", "Okafor", "Rossi", "Tanaka",
+              "Müller", "Haddad", "Singh", "Silva", "Kim", "Ivanova", "Mensah", "Cohen"]
+TIMEZONES = ["America/Chicago", "America/New_York", "Europe/London", "Asia/Kolkata",
+             "Asia/Tokyo", "Australia/Sydney", ""]
+
+
+def parse_size(value):
+    """Accept a named size ('100k') or a plain row count"""
+    value = value.strip().lower()
+    if value in SIZES:
+        return value, SIZES[value]
+    return value, int(value.replace("_", ""))
+
+
+def generate_contacts(count, seed=0, timezones=False, skip=None):
+    """Yield ``count`` deterministic (name, phone, birthday[, timezone]) rows
+
+    Birthdays are spread over the whole year, including 29-Feb, in the
+    'd-Mon' form the app writes. ``skip`` is a date nobody has a birthday
+    on, for measuring a run with nothing to send.
+    """
+    rng = random.Random(seed)
+    days = [(month, day) for month, length in enumerate(DAYS_IN_MONTH, 1)
+            for day in range(1, length + 1)]
+    if skip is not None:
+        days.remove((skip.month, skip.day))
+    for i in range(count):
+        month, day = rng.choice(days)
+        name = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {i}"
+        row = (name, f"+1{rng.randrange(2_000_000_000, 9_999_999_999)}",
+               f"{day}-{MONTH_ABBRS[month - 1].title()}")
+        if timezones:
+            row += (rng.choice(TIMEZONES),)
+        yield row
+
+
+def write_contacts(path, count, seed=0, timezones=False, skip=None):
+    """Write a synthetic contacts CSV and return its path"""
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "phone", "birthday"] + (["timezone"] if timezones else []))
+        writer.writerows(generate_contacts(count, seed, timezones, skip))
+    return path
+
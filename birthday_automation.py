@@ -1,10 +1,15 @@
 import os
-import pandas as pd
-from PIL import Image, ImageDraw, ImageFont
-import pywhatkit
-from datetime import datetime
+from datetime import date, timedelta
 import time
 import sys
+import argparse
+import metrics
+from card_pipeline import FORMATS, DEFAULT_QUALITY, Spool, render_batch
+from send_journal import SendJournal, contact_key
+from contact_store import default_contacts_path, read_birthdays, read_birthdays_between
+
+# Sending machinery (PIL, pandas, HTTP, pywhatkit) is imported where it is
+# first needed, so a run with no birthdays today starts and exits quickly
 
 def resource_path(relative_path):
     """Get absolute path to resource, works for dev and for PyInstaller"""
@@ -15,93 +20,295 @@ def resource_path(relative_path):
         base_path = os.path.abspath(".")
     return os.path.join(base_path, relative_path)
 
-def create_birthday_image(name):
-    """Create a personalized birthday image"""
-    # Load the base cake image
-    try:
-        img = Image.open(resource_path("cake_template.png"))
-    except FileNotFoundError:
-        print("Error: cake_template.png not found!")
-        return None
+def birthday_message(name):
+    """Text sent alongside the birthday card"""
+    return f"🎉 Happy Birthday {name}! 🎂\nWishing you a fantastic day filled with joy and happiness! 🎈"
+
+def report_result(result):
+    """Print the outcome of one send"""
+    name = result.job.name
+    if result.ok:
+        print(f"Birthday message sent successfully to {name}")
+    elif result.cancelled:
+        print(f"Cancelled birthday message to {name}")
+    else:
+        print(f"Error sending message to {name}: {str(result.error)}")
+
+def open_transport(args, spool):
+    """Create the transport selected on the command line"""
+    from transports import PyWhatKitTransport, HttpTransport, FakeServer
+
+    if args.transport == "http":
+        if not args.http_url:
+            raise SystemExit("--http-url is required with --transport http")
+        return HttpTransport(args.http_url), None
+    if args.transport == "fake":
+        server = FakeServer(latency=args.fake_latency, failure_rate=args.fake_failure_rate,
+                            rate_limit=args.fake_rate_limit).start()
+        return HttpTransport(server.url), server
+    return PyWhatKitTransport(spool), None
 
-    # Create drawing object
-    draw = ImageDraw.Draw(img)
+def parse_args(argv=None):
+    """Parse command-line options"""
+    parser = argparse.ArgumentParser(description="Send today's birthday wishes")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="processes used to render cards (default: one per CPU, 1 renders in-process)")
+    parser.add_argument("--format", choices=FORMATS, default="png",
+                        help="encoding for outgoing cards (default: optimized png)")
+    parser.add_argument("--quality", type=int, default=DEFAULT_QUALITY,
+                        help="jpeg/webp quality")
+    parser.add_argument("--max-dim", type=int, default=None,
+                        help="cap the longest side of outgoing cards, in pixels")
+    parser.add_argument("--transport", choices=("pywhatkit", "http", "fake"), default="pywhatkit",
+                        help="how messages are delivered (fake runs a local stand-in provider)")
+    parser.add_argument("--http-url", help="endpoint for --transport http")
+    parser.add_argument("--fake-latency", type=float, default=0.2,
+                        help="simulated seconds per message for --transport fake")
+    parser.add_argument("--fake-failure-rate", type=float, default=0.0,
+                        help="fraction of messages the fake provider rejects")
+    parser.add_argument("--fake-rate-limit", type=float, default=None,
+                        help="messages per second the fake provider accepts")
+    parser.add_argument("--concurrency", type=int, default=None,
+                        help="parallel sends (default: 1 for pywhatkit, 8 otherwise)")
+    parser.add_argument("--rate", type=float, default=None,
+                        help="max messages per second overall (default: 0.2 for pywhatkit, unlimited otherwise)")
+    parser.add_argument("--per-recipient-rate", type=float, default=None,
+                        help="max messages per second to any one phone number")
+    parser.add_argument("--max-attempts", type=int, default=3,
+                        help="send attempts per message within one run")
+    parser.add_argument("--contacts", default=None,
+                        help="contacts CSV or SQLite database (default: contacts.db if migrated, else contacts.csv)")
+    parser.add_argument("--journal", default="send_journal.db",
+                        help="SQLite file recording which wishes were sent, so reruns resume")
+    parser.add_argument("--daemon", action="store_true",
+                        help="keep running and send each day at --send-at instead of once")
+    parser.add_argument("--send-at", default="09:00",
+                        help="local time (HH:MM) wishes go out in daemon mode")
+    parser.add_argument("--timezone", default=None,
+                        help="IANA zone for contacts with no or an unknown timezone value (default: system local)")
+    parser.add_argument("--from", dest="from_date", default=None,
+                        help="list birthdays from this date (YYYY-MM-DD, or '1-Dec' for this year) and exit")
+    parser.add_argument("--to", dest="to_date", default=None,
+                        help="last date to list (default: 30 days after --from); "
+                             "'15-Jan' after '1-Dec' means next January")
+    parser.add_argument("--metrics-log", default=os.environ.get(metrics.LOG_ENV),
+                        help=f"append a JSON line per timed stage to this file (default: ${metrics.LOG_ENV})")
+    parser.add_argument("--metrics-prom", default=os.environ.get(metrics.PROM_ENV),
+                        help=f"write counters and latency histograms to this Prometheus textfile "
+                             f"(default: ${metrics.PROM_ENV})")
+    args = parser.parse_args(argv)
+    # WhatsApp Web drives a single browser, so it cannot send in parallel
+    if args.concurrency is None:
+        args.concurrency = 1 if args.transport == "pywhatkit" else 8
+    if args.rate is None and args.transport == "pywhatkit":
+        args.rate = 0.2
+    return args
+
+def send_wishes(args, birthday_people, day, journal, cancel_event=None):
+    """Render and send wishes for one day, skipping anyone the journal says is done
+
+    ``birthday_people`` maps 'name' and 'phone' to equal-length columns, as
+    a DataFrame or a read_birthdays table does. Returns the time of the next
+    scheduled retry for the day, or None.
+    """
+    from card_renderer import cache_stats
+    from dispatcher import Dispatcher, SendJob
+
+    names = list(birthday_people['name'])
+    phones = list(birthday_people['phone'])
+    keys = [contact_key(name, phone) for name, phone in zip(names, phones)]
+    journal.enqueue(day, zip(keys, names, phones))
+    # Another run (the daemon, a cron one-shot) may be sending the same day;
+    # only the jobs claimed here are ours to send
+    claimed = journal.claim(day, dict.fromkeys(keys))
+    # Each key is sent once, however many rows name the same contact
+    pending = []
+    for name, phone, key in zip(names, phones, keys):
+        if key in claimed:
+            claimed.discard(key)
+            pending.append((name, phone, key))
+    names = [name for name, _, _ in pending]
+    phones = [phone for _, phone, _ in pending]
+    keys = [key for _, _, key in pending]
     
+    if not pending:
+        summary = journal.summary(day)
+        print(f"Nothing left to send for {day} "
+              f"({summary.get('sent', 0)} sent, {summary.get('failed', 0)} waiting to retry)")
+        return journal.next_retry(day)
+    
+    # Render every card up front across the worker pool
+    start = time.perf_counter()
     try:
-        font = ImageFont.truetype(resource_path("arial.ttf"), 60)
-    except:
-        font = ImageFont.load_default()
-
-    # Add text to image
-    message = f"Happy Birthday\n{name}!"
+        cards = render_batch(names,
+                             resource_path("cake_template.png"),
+                             font_path=resource_path("arial.ttf"),
+                             workers=args.workers, fmt=args.format,
+                             quality=args.quality, max_dim=args.max_dim)
+    except FileNotFoundError as e:
+        print("Error: cake_template.png not found!")
+        for key in keys:
+            journal.mark_failed(day, key, e)
+        return journal.next_retry(day)
+    render_seconds = time.perf_counter() - start
     
-    # Get text size
-    text_bbox = draw.textbbox((0, 0), message, font=font)
-    text_width = text_bbox[2] - text_bbox[0]
-    text_height = text_bbox[3] - text_bbox[1]
+    def record_result(result):
+        report_result(result)
+        if result.ok:
+            journal.mark_sent(day, result.job.key)
+        elif result.cancelled and not result.attempts:
+            journal.release(day, [result.job.key])
+        else:
+            journal.mark_failed(day, result.job.key, result.error)
     
-    # Calculate position (center of image)
-    x = (img.width - text_width) // 2
-    y = (img.height - text_height) // 2
+    # Cards stay in memory; the spool is removed when sending finishes
+    with Spool() as spool:
+        transport, fake_server = open_transport(args, spool)
+        dispatcher = Dispatcher(transport, concurrency=args.concurrency, rate=args.rate,
+                                per_recipient_rate=args.per_recipient_rate,
+                                max_attempts=args.max_attempts, cancel_event=cancel_event)
+        jobs = [SendJob(phone, birthday_message(name), card, name, key)
+                for name, phone, card, key in zip(names, phones, cards, keys)]
+        print(f"\nSending {len(jobs)} birthday wish(es)...")
+        start = time.perf_counter()
+        try:
+            results = dispatcher.dispatch(jobs, on_result=record_result)
+            sent = sum(result.ok for result in results)
+        finally:
+            transport.close()
+            if fake_server:
+                fake_server.stop()
+            # Anything still marked rendering was never attempted
+            journal.release(day, keys)
+        send_seconds = time.perf_counter() - start
+    metrics.flush()
     
-    # Add text with outline for better visibility
-    draw.text((x, y), message, fill='white', font=font, align="center")
+    rate = sent / send_seconds if send_seconds else float("inf")
+    print(f"\nSent {sent}/{len(cards)} message(s) via {transport.name} "
+          f"in {send_seconds:.2f}s ({rate:.1f} msgs/sec), "
+          f"{dispatcher.stats['retries']} retries, {dispatcher.stats['rate_limited']} rate-limited")
+    rate = len(cards) / render_seconds if render_seconds else float("inf")
+    total_kb = sum(len(card) for card in cards) / 1024
+    print(f"Rendered {len(cards)} card(s) in {render_seconds:.2f}s ({rate:.1f} cards/sec), "
+          f"{total_kb:.0f} KB as {args.format}")
+    if args.workers == 1:
+        stats = cache_stats()
+        print(f"Template cache: {stats['template_hits']} hits, {stats['template_misses']} misses; "
+              f"font cache: {stats['font_hits']} hits, {stats['font_misses']} misses")
+    return journal.next_retry(day)
+
+def parse_date_arg(text, today):
+    """Parse a --from/--to date; returns (date, whether a year was given)"""
+    from contact_index import birthday_ordinal, occurrence_date, parse_birthday
+
+    try:
+        return date.fromisoformat(text), True
+    except ValueError:
+        pass
+    parsed = parse_birthday(text)
+    if parsed is None:
+        raise ValueError(f"invalid date {text!r}; use YYYY-MM-DD or a day like '1-Dec'")
+    return occurrence_date(today.year, birthday_ordinal(*parsed)), False
+
+def list_birthdays(args):
+    """Print everyone with a birthday between --from and --to, in date order"""
+    from contact_index import birthday_ordinal, occurrence_date
+
+    today = date.today()
+    try:
+        start, _ = parse_date_arg(args.from_date, today) if args.from_date else (today, True)
+        if args.to_date:
+            end, has_year = parse_date_arg(args.to_date, today)
+        else:
+            end, has_year = start + timedelta(days=30), True
+    except ValueError as e:
+        print(f"Error: {str(e)}")
+        return
+    if end < start:
+        if has_year:
+            print(f"Error: --to {end} is before --from {start}")
+            return
+        # '1-Dec' to '15-Jan' wraps into the next year
+        end = occurrence_date(end.year + 1, birthday_ordinal(end.month, end.day))
     
-    # Save the image
-    output_path = f"birthday_{name}.png"
-    img.save(output_path)
-    return output_path
+    _, people, dates = read_birthdays_between(args.contacts, start, end)
+    print(f"Birthdays from {start:%a %d %b %Y} to {end:%a %d %b %Y}:")
+    for when, name, phone in zip(dates, people['name'], people['phone']):
+        print(f"  {when:%a %d %b}  {name}  ({phone})")
+    print(f"{len(dates)} birthday(s)")
 
-def send_birthday_message(phone_number, name, image_path):
-    """Send WhatsApp message with birthday image"""
+def run_daemon(args):
+    """Stay resident and send each contact's wishes at their local morning"""
+    from contact_store import open_store
+    from scheduler import BirthdayScheduler, parse_send_at, load_zone
+
+    store = open_store(args.contacts)
+    journal = SendJournal(args.journal)
+    recovered = journal.recover()
+    if recovered:
+        print(f"Resuming {recovered} wish(es) interrupted by a previous run")
+    
+    scheduler = BirthdayScheduler(store, None, send_at=parse_send_at(args.send_at),
+                                  default_zone=load_zone(args.timezone))
+    scheduler.run_day = lambda people, day: send_wishes(args, people, day, journal,
+                                                        scheduler.stopping)
+    scheduler.install_signal_handlers()
     try:
-        message = f"🎉 Happy Birthday {name}! 🎂\nWishing you a fantastic day filled with joy and happiness! 🎈"
-        pywhatkit.sendwhats_image(phone_number, image_path, message, wait_time=15)
-        print(f"Birthday message sent successfully to {name}")
-        time.sleep(5)  # Wait between messages to avoid rate limiting
-    except Exception as e:
-        print(f"Error sending message to {name}: {str(e)}")
+        scheduler.run_forever()
+    finally:
+        journal.close()
 
-def main():
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv[:1] == ["import"]:
+        # Bulk import pulls in pandas, which sending does not need
+        from contact_import import main as import_main
+        import_main(argv[1:])
+        return
+    args = parse_args(argv)
+    metrics.configure(args.metrics_log, args.metrics_prom)
+    args.contacts = args.contacts or default_contacts_path(resource_path(""))
+    if args.from_date or args.to_date:
+        list_birthdays(args)
+        return
+    if args.daemon:
+        run_daemon(args)
+        return
     try:
-        # Read contacts from CSV
-        df = pd.read_csv(resource_path("contacts.csv"))
-        
         print("Birthday Automation Started!")
         print("Reading contacts list...")
         
-        today = datetime.now().strftime("%m-%d")
-        
-        # Filter contacts whose birthday is today
-        birthday_people = df[df['birthday'].str.contains(today)]
+        # Look up today's birthdays; the csv module (or one indexed SQLite
+        # query) is enough, so nothing heavy is imported on quiet days
+        today = date.today()
+        _, birthday_people = read_birthdays(args.contacts, today)
         
-        if len(birthday_people) == 0:
+        if not birthday_people['name']:
             print("No birthdays today!")
             return
         
-        print(f"Found {len(birthday_people)} birthday(s) today!")
+        print(f"Found {len(birthday_people['name'])} birthday(s) today!")
         
-        for _, person in birthday_people.iterrows():
-            print(f"\nProcessing birthday wish for {person['name']}...")
-            
-            # Create personalized image
-            image_path = create_birthday_image(person['name'])
-            if image_path:
-                # Send WhatsApp message
-                send_birthday_message(person['phone'], person['name'], image_path)
-                
-                # Clean up the generated image
-                try:
-                    os.remove(image_path)
-                except:
-                    pass
+        journal = SendJournal(args.journal)
+        recovered = journal.recover()
+        if recovered:
+            print(f"Resuming {recovered} wish(es) interrupted by a previous run")
+        try:
+            send_wishes(args, birthday_people, today.isoformat(), journal)
+        finally:
+            journal.close()
         
         print("\nBirthday automation completed!")
         
     except Exception as e:
         print(f"An error occurred: {str(e)}")
     
-    input("\nPress Enter to exit...")
+    # Only pause for a console window; under cron or a service this would hang
+    if sys.stdin is not None and sys.stdin.isatty():
+        input("\nPress Enter to exit...")
 
 if __name__ == "__main__":
+    # Needed for the render pool in PyInstaller builds
+    import multiprocessing
+    multiprocessing.freeze_support()
     main() 
\ No newline at end of file
@@ -1,14 +1,17 @@
 import os
-import pandas as pd
-from PIL import Image, ImageDraw, ImageFont, ImageTk
-import pywhatkit
-from datetime import datetime
-import time
+from datetime import datetime, date
 import sys
 import tkinter as tk
 from tkinter import ttk, messagebox
 from tkcalendar import Calendar
 import threading
+from contact_store import default_contacts_path, read_birthdays
+from tree_binding import TreeBinding
+from card_pipeline import Spool, make_card
+from transports import PyWhatKitTransport
+from dispatcher import Dispatcher, SendJob
+from ui_events import EventPump
+import metrics
 
 class BirthdayApp:
     def __init__(self, root):
@@ -45,10 +48,15 @@ class BirthdayApp:
         self.birthday_frame.pack(fill=tk.BOTH, expand=True, pady=(0, 20))
         
         # Create Treeview for birthdays
-        self.birthday_tree = ttk.Treeview(self.birthday_frame, columns=("Name", "Phone"), show="headings")
+        self.birthday_tree = ttk.Treeview(self.birthday_frame, columns=("Name", "Phone", "Status"),
+                                          show="headings")
         self.birthday_tree.heading("Name", text="Name")
         self.birthday_tree.heading("Phone", text="Phone")
+        self.birthday_tree.heading("Status", text="Status")
         self.birthday_tree.pack(fill=tk.BOTH, expand=True)
+        self.birthday_rows = TreeBinding(self.birthday_tree)
+        # Per-row send state shown in the Status column, keyed by tree item id
+        self.send_state = {}
         
         # Buttons frame
         button_frame = ttk.Frame(self.main_frame, style="Custom.TFrame")
@@ -60,17 +68,37 @@ class BirthdayApp:
         refresh_btn.pack(side=tk.LEFT, padx=5)
         
         # Send wishes button
-        send_btn = ttk.Button(button_frame, text="Send Birthday Wishes", 
-                            command=self.send_selected_wishes, style="Custom.TButton")
-        send_btn.pack(side=tk.LEFT, padx=5)
+        self.send_btn = ttk.Button(button_frame, text="Send Birthday Wishes", 
+                                   command=self.send_selected_wishes, style="Custom.TButton")
+        self.send_btn.pack(side=tk.LEFT, padx=5)
+        
+        # Cancel button, enabled while a batch is sending
+        self.cancel_btn = ttk.Button(button_frame, text="Cancel", state=tk.DISABLED,
+                                     command=self.cancel_sending, style="Custom.TButton")
+        self.cancel_btn.pack(side=tk.LEFT, padx=5)
         
         # Status frame
         self.status_frame = ttk.Frame(self.main_frame, style="Custom.TFrame")
         self.status_frame.pack(fill=tk.X)
         
+        self.progress = ttk.Progressbar(self.status_frame, mode="determinate")
+        self.progress.pack(fill=tk.X, pady=(0, 5))
+        
         self.status_label = ttk.Label(self.status_frame, text="Ready", style="Info.TLabel")
         self.status_label.pack()
         
+        # Background threads never touch widgets; they post events to the pump
+        self.events = EventPump(root)
+        self.events.start()
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
+        
+        # Private scratch space for cards handed to pywhatkit
+        self.spool = Spool()
+        self.transport = PyWhatKitTransport(self.spool)
+        # A dispatcher per batch, so cancelling one batch does not affect the next
+        self.dispatcher = None
+        self.batch = None
+        
         # Load birthdays on startup
         self.refresh_birthdays()
     
@@ -84,71 +112,96 @@ class BirthdayApp:
     
     def refresh_birthdays(self):
         """Refresh the birthday list"""
-        # Clear existing items
-        for item in self.birthday_tree.get_children():
-            self.birthday_tree.delete(item)
-        
         try:
-            # Read contacts from CSV
-            df = pd.read_csv(self.resource_path("contacts.csv"))
-            today = datetime.now().strftime("%d-%b")
+            # Look up today's birthdays in contacts.db or contacts.csv (with its change log)
+            positions, birthday_people = read_birthdays(
+                default_contacts_path(self.resource_path("")), date.today())
             
-            # Filter contacts whose birthday is today
-            birthday_people = df[df['birthday'].str.contains(today, case=False)]
+            # Update the treeview in place
+            self.birthday_rows.update(
+                (iid, (name, phone, self.send_state.get(str(iid), "")))
+                for iid, name, phone in zip(positions,
+                                            birthday_people['name'], birthday_people['phone']))
             
-            if len(birthday_people) == 0:
+            if not positions:
                 self.status_label.config(text="No birthdays today!")
                 return
             
-            # Add to treeview
-            for _, person in birthday_people.iterrows():
-                self.birthday_tree.insert("", tk.END, values=(person['name'], person['phone']))
-            
-            self.status_label.config(text=f"Found {len(birthday_people)} birthday(s) today!")
+            self.status_label.config(text=f"Found {len(positions)} birthday(s) today!")
             
         except Exception as e:
             messagebox.showerror("Error", f"Error loading birthdays: {str(e)}")
             self.status_label.config(text="Error loading birthdays!")
     
     def create_birthday_image(self, name):
-        """Create a personalized birthday image"""
-        try:
-            img = Image.open(self.resource_path("cake_template.png"))
-        except FileNotFoundError:
-            messagebox.showerror("Error", "cake_template.png not found!")
-            return None
-
-        draw = ImageDraw.Draw(img)
-        
-        try:
-            font = ImageFont.truetype(self.resource_path("arial.ttf"), 60)
-        except:
-            font = ImageFont.load_default()
-
-        message = f"Happy Birthday\n{name}!"
-        
-        text_bbox = draw.textbbox((0, 0), message, font=font)
-        text_width = text_bbox[2] - text_bbox[0]
-        text_height = text_bbox[3] - text_bbox[1]
-        
-        x = (img.width - text_width) // 2
-        y = (img.height - text_height) // 2
-        
-        draw.text((x, y), message, fill='white', font=font, align="center")
-        
-        output_path = f"birthday_{name}.png"
-        img.save(output_path)
-        return output_path
+        """Create a personalized birthday card, encoded in memory"""
+        return make_card(name, self.resource_path("cake_template.png"),
+                         font_path=self.resource_path("arial.ttf"))
     
-    def send_birthday_message(self, phone_number, name, image_path):
-        """Send WhatsApp message with birthday image"""
-        try:
-            message = f"🎉 Happy Birthday {name}! 🎂\nWishing you a fantastic day filled with joy and happiness! 🎈"
-            pywhatkit.sendwhats_image(phone_number, image_path, message, wait_time=15)
-            return True
-        except Exception as e:
-            messagebox.showerror("Error", f"Error sending message to {name}: {str(e)}")
-            return False
+    def birthday_message(self, name):
+        """Text sent alongside the birthday card"""
+        return f"🎉 Happy Birthday {name}! 🎂\nWishing you a fantastic day filled with joy and happiness! 🎈"
+    
+    def set_item_state(self, item, text):
+        """Show the send state of one row (Tk thread only)"""
+        self.send_state[item] = text
+        if self.birthday_tree.exists(item):
+            self.birthday_tree.set(item, "Status", text)
+    
+    def report_send_result(self, item, result):
+        """Record the outcome of one send and advance the progress bar (Tk thread only)"""
+        batch = self.batch
+        if result.ok:
+            batch["sent"] += 1
+            self.set_item_state(item, "Sent")
+        elif result.cancelled and not result.attempts:
+            batch["cancelled"] += 1
+            self.set_item_state(item, "Cancelled")
+        else:
+            batch["failed"].append(f"{result.job.name}: {str(result.error)}")
+            self.set_item_state(item, "Failed")
+        self.progress.config(value=batch["sent"] + batch["cancelled"] + len(batch["failed"]))
+        self.status_label.config(text=f"Sent {batch['sent']}/{batch['total']}, "
+                                      f"{len(batch['failed'])} failed")
+    
+    def finish_batch(self, error=None):
+        """Restore the controls and summarise the batch (Tk thread only)"""
+        batch = self.batch
+        self.batch = None
+        metrics.flush()
+        self.send_btn.config(state=tk.NORMAL)
+        self.cancel_btn.config(state=tk.DISABLED)
+        for item in batch["items"]:
+            if self.send_state.get(item) in ("Queued", "Rendering"):
+                self.set_item_state(item, "Cancelled")
+        if error:
+            self.status_label.config(text="Sending failed!")
+            messagebox.showerror("Error", error)
+            return
+        summary = f"Sent {batch['sent']}/{batch['total']} wish(es)"
+        if batch["failed"]:
+            summary += f", {len(batch['failed'])} failed"
+        if self.dispatcher.cancelled:
+            summary += " (cancelled)"
+        self.status_label.config(text=summary + "!")
+        if batch["failed"]:
+            # One summary dialog rather than one per failure
+            shown = "\n".join(batch["failed"][:10])
+            if len(batch["failed"]) > 10:
+                shown += f"\n... and {len(batch['failed']) - 10} more"
+            messagebox.showerror("Error", f"Some wishes could not be sent:\n{shown}")
+    
+    def cancel_sending(self):
+        """Stop the current batch; the send in progress finishes"""
+        if self.dispatcher and self.batch:
+            self.dispatcher.cancel()
+            self.cancel_btn.config(state=tk.DISABLED)
+            self.status_label.config(text="Cancelling...")
+    
+    def on_close(self):
+        self.cancel_sending()
+        self.events.stop()
+        self.root.destroy()
     
     def send_selected_wishes(self):
         """Send wishes to selected contacts"""
@@ -156,29 +209,55 @@ class BirthdayApp:
         if not selected_items:
             messagebox.showwarning("Warning", "Please select contacts to send wishes to!")
             return
+        if self.batch:
+            return
+        
+        # Read everything the worker needs while still on the Tk thread
+        people = []
+        for item in selected_items:
+            name, phone = self.birthday_tree.item(item)['values'][:2]
+            people.append((item, name, phone))
+            self.set_item_state(item, "Queued")
+        
+        # WhatsApp Web drives one browser: one send at a time, at most one every 5s
+        self.dispatcher = Dispatcher(self.transport, concurrency=1, rate=0.2)
+        dispatcher = self.dispatcher
+        self.batch = {"items": [item for item, _, _ in people], "total": len(people),
+                      "sent": 0, "cancelled": 0, "failed": []}
+        self.progress.config(maximum=len(people), value=0)
+        self.send_btn.config(state=tk.DISABLED)
+        self.cancel_btn.config(state=tk.NORMAL)
+        self.status_label.config(text="Sending wishes...")
+        post = self.events.post
         
         def send_wishes_thread():
-            self.status_label.config(text="Sending wishes...")
-            for item in selected_items:
-                values = self.birthday_tree.item(item)['values']
-                name, phone = values
+            jobs = []
+            try:
+                for item, name, phone in people:
+                    if dispatcher.cancelled:
+                        break
+                    post(self.set_item_state, item, "Rendering")
+                    card = self.create_birthday_image(name)
+                    job = SendJob(phone, self.birthday_message(name), card, name, key=item)
+                    jobs.append(job)
+                    post(self.set_item_state, item, "Queued")
                 
-                image_path = self.create_birthday_image(name)
-                if image_path:
-                    if self.send_birthday_message(phone, name, image_path):
-                        self.status_label.config(text=f"Sent wishes to {name}")
-                    try:
-                        os.remove(image_path)
-                    except:
-                        pass
-                    time.sleep(5)  # Wait between messages
-            
-            self.status_label.config(text="All wishes sent successfully!")
+                # The dispatcher paces sends to the provider's rate limit
+                dispatcher.dispatch(jobs, on_result=lambda result: post(
+                    self.report_send_result, result.job.key, result))
+            except FileNotFoundError:
+                post(self.finish_batch, "cake_template.png not found!")
+                return
+            except Exception as e:
+                post(self.finish_batch, f"Error sending wishes: {str(e)}")
+                return
+            post(self.finish_batch)
         
         # Run in separate thread to keep UI responsive
         threading.Thread(target=send_wishes_thread, daemon=True).start()
 
 def main():
+    metrics.configure_from_env()
     root = tk.Tk()
     app = BirthdayApp(root)
     root.mainloop()
@@ -1,12 +1,19 @@
 import os
-import pandas as pd
-from datetime import datetime
+from datetime import datetime, timedelta
 import tkinter as tk
 from tkinter import ttk, messagebox
 from tkcalendar import DateEntry
 import platform
-from PIL import Image, ImageDraw, ImageFont, ImageTk
+from PIL import Image, ImageTk
 import random
+import queue
+from contact_store import default_contacts_path, open_store
+from contact_import import ContactImporter, InvalidContact
+from tree_binding import TreeBinding
+from virtual_tree import VirtualTree
+from card_renderer import render_card
+from thumbnail_cache import ThumbnailCache, ThumbnailLoader, THUMB_SIZE
+import metrics
 
 class BirthdayViewer:
     def __init__(self, root):
@@ -14,6 +21,11 @@ class BirthdayViewer:
         self.root.title("ISCF Birthdays")
         self.root.geometry("1000x700")
         
+        # Shared contact store used by every tab: contacts.db once migrated, else the CSV
+        self.store = open_store(default_contacts_path())
+        # New contacts are validated, normalized to E.164 and checked for duplicates
+        self.importer = ContactImporter(self.store)
+        
         # Enhanced Color scheme
         self.colors = {
             'navy': '#000080',  # Navy Blue
@@ -242,6 +254,7 @@ class BirthdayViewer:
         self.today_tree.heading("Name", text="Name")
         self.today_tree.heading("Phone", text="Phone")
         self.today_tree.pack(fill=tk.BOTH, expand=True, pady=(0, 10))
+        self.today_rows = TreeBinding(self.today_tree)
         
         # Buttons frame
         btn_frame = ttk.Frame(self.today_frame)
@@ -270,7 +283,8 @@ class BirthdayViewer:
         
         ttk.Label(search_frame, text="Search:", style="Form.TLabel").pack(side=tk.LEFT)
         self.search_var = tk.StringVar()
-        self.search_var.trace('w', self._filter_contacts)
+        self.search_var.trace('w', self._schedule_filter)
+        self._filter_job = None
         search_entry = ttk.Entry(search_frame, textvariable=self.search_var, style="TEntry")
         search_entry.pack(side=tk.LEFT, padx=(5, 10))
         
@@ -281,12 +295,16 @@ class BirthdayViewer:
         self.contacts_tree.heading("Name", text="Name", command=lambda: self._sort_contacts("name"))
         self.contacts_tree.heading("Phone", text="Phone", command=lambda: self._sort_contacts("phone"))
         self.contacts_tree.heading("Birthday", text="Birthday", command=lambda: self._sort_contacts("birthday"))
-        self.contacts_tree.pack(fill=tk.BOTH, expand=True)
         
-        # Add scrollbar
-        scrollbar = ttk.Scrollbar(self.contacts_frame, orient=tk.VERTICAL, command=self.contacts_tree.yview)
+        # Add scrollbar, driven by the row count rather than the tree's items
+        scrollbar = ttk.Scrollbar(self.contacts_frame, orient=tk.VERTICAL)
         scrollbar.pack(side=tk.RIGHT, fill=tk.Y)
-        self.contacts_tree.configure(yscrollcommand=scrollbar.set)
+        self.contacts_tree.pack(fill=tk.BOTH, expand=True)
+        
+        # Only the visible rows exist as tree items; the rest stay in the store
+        self.contacts_view = VirtualTree(self.contacts_tree, scrollbar)
+        self.contacts_query = None
+        self._sort_column = None
         
         # Buttons frame
         btn_frame = ttk.Frame(self.contacts_frame)
@@ -317,17 +335,34 @@ class BirthdayViewer:
         ttk.Label(controls_frame, text="days").pack(side=tk.LEFT)
         
         update_btn = ttk.Button(controls_frame, text="Update", 
-                              command=self._refresh_upcoming, style="Custom.TButton")
+                              command=self._show_next_days, style="Custom.TButton")
         update_btn.pack(side=tk.LEFT, padx=(10, 0))
         
+        # Or any date range, e.g. 1 Dec to 15 Jan
+        self._upcoming_range = None
+        ttk.Label(controls_frame, text="or from:").pack(side=tk.LEFT, padx=(20, 5))
+        self.range_from = DateEntry(controls_frame, width=10, background='darkblue',
+                                    foreground='white', borderwidth=2)
+        self.range_from.pack(side=tk.LEFT)
+        ttk.Label(controls_frame, text="to:").pack(side=tk.LEFT, padx=(5, 5))
+        self.range_to = DateEntry(controls_frame, width=10, background='darkblue',
+                                  foreground='white', borderwidth=2)
+        self.range_to.set_date(datetime.now().date() + timedelta(days=30))
+        self.range_to.pack(side=tk.LEFT)
+        range_btn = ttk.Button(controls_frame, text="Show", 
+                             command=self._show_range, style="Custom.TButton")
+        range_btn.pack(side=tk.LEFT, padx=(10, 0))
+        
         # Upcoming birthdays list
         self.upcoming_tree = ttk.Treeview(self.upcoming_frame, 
-                                        columns=("Name", "Birthday", "Days"), 
+                                        columns=("Name", "Birthday", "Date", "Days"), 
                                         show="headings")
         self.upcoming_tree.heading("Name", text="Name")
         self.upcoming_tree.heading("Birthday", text="Birthday")
+        self.upcoming_tree.heading("Date", text="Date")
         self.upcoming_tree.heading("Days", text="Days Until")
         self.upcoming_tree.pack(fill=tk.BOTH, expand=True)
+        self.upcoming_rows = TreeBinding(self.upcoming_tree)
     
     def _show_add_dialog(self):
         """Show dialog to add new contact"""
@@ -366,40 +401,29 @@ class BirthdayViewer:
         ttk.Button(dialog, text="Save", command=save).pack(pady=20)
     
     def _add_contact(self, name, phone, birthday):
-        """Add a new contact to the CSV file"""
+        """Add a new contact to the contact store"""
         try:
-            # Read existing contacts
-            try:
-                df = pd.read_csv("contacts.csv")
-            except FileNotFoundError:
-                df = pd.DataFrame(columns=["name", "phone", "birthday"])
-            
-            # Add new contact
-            new_contact = pd.DataFrame({
-                "name": [name],
-                "phone": [phone],
-                "birthday": [birthday]
-            })
-            
-            df = pd.concat([df, new_contact], ignore_index=True)
-            df.to_csv("contacts.csv", index=False)
+            self.importer.add(name, phone, birthday)
             
             messagebox.showinfo("Success", "Contact added successfully!")
             self.refresh_all()
             
+        except InvalidContact as e:
+            messagebox.showerror("Error", f"Cannot add contact: {str(e)}")
         except Exception as e:
             messagebox.showerror("Error", f"Error adding contact: {str(e)}")
     
     def _edit_contact(self):
         """Edit selected contact"""
-        selected = self.contacts_tree.selection()
+        selected = self.contacts_view.selection()
         if not selected:
             messagebox.showwarning("Warning", "Please select a contact to edit!")
             return
         
         # Get current values
-        values = self.contacts_tree.item(selected[0])['values']
-        name, phone, birthday = values
+        contact_id = int(selected[0])
+        contact = self.store.get(contact_id)
+        name, phone, birthday = contact['name'], contact['phone'], contact['birthday']
         
         # Create edit dialog
         dialog = tk.Toplevel(self.root)
@@ -439,11 +463,7 @@ class BirthdayViewer:
                 return
             
             try:
-                df = pd.read_csv("contacts.csv")
-                # Find and update the contact
-                mask = (df['name'] == name) & (df['phone'] == phone) & (df['birthday'] == birthday)
-                df.loc[mask, ['name', 'phone', 'birthday']] = [new_name, new_phone, new_birthday]
-                df.to_csv("contacts.csv", index=False)
+                self.importer.update(contact_id, new_name, new_phone, new_birthday)
                 
                 messagebox.showinfo("Success", "Contact updated successfully!")
                 self.refresh_all()
@@ -456,7 +476,7 @@ class BirthdayViewer:
     
     def _delete_contact(self):
         """Delete selected contact"""
-        selected = self.contacts_tree.selection()
+        selected = self.contacts_view.selection()
         if not selected:
             messagebox.showwarning("Warning", "Please select a contact to delete!")
             return
@@ -464,15 +484,9 @@ class BirthdayViewer:
         if not messagebox.askyesno("Confirm Delete", "Are you sure you want to delete this contact?"):
             return
         
-        values = self.contacts_tree.item(selected[0])['values']
-        name, phone, birthday = values
-        
         try:
-            df = pd.read_csv("contacts.csv")
-            # Find and remove the contact
-            mask = (df['name'] == name) & (df['phone'] == phone) & (df['birthday'] == birthday)
-            df = df[~mask]
-            df.to_csv("contacts.csv", index=False)
+            self.importer.delete(int(selected[0]))
+            self.contacts_view.clear_selection()
             
             messagebox.showinfo("Success", "Contact deleted successfully!")
             self.refresh_all()
@@ -480,82 +494,81 @@ class BirthdayViewer:
         except Exception as e:
             messagebox.showerror("Error", f"Error deleting contact: {str(e)}")
     
-    def _filter_contacts(self, *args):
+    def _schedule_filter(self, *args):
+        """Debounce keystrokes so a burst of typing runs a single search"""
+        if self._filter_job is not None:
+            self.root.after_cancel(self._filter_job)
+        self._filter_job = self.root.after(250, self._filter_contacts)
+    
+    def _filter_contacts(self, keep_position=False):
         """Filter contacts based on search text"""
-        search_text = self.search_var.get().lower()
-        
-        # Clear current display
-        for item in self.contacts_tree.get_children():
-            self.contacts_tree.delete(item)
+        self._filter_job = None
+        search_text = self.search_var.get()
         
         try:
-            df = pd.read_csv("contacts.csv")
-            # Convert phone numbers to strings
-            df['phone'] = df['phone'].astype(str)
-            
-            # Filter based on search text
-            filtered_df = df[
-                df['name'].str.lower().str.contains(search_text) |
-                df['phone'].str.contains(search_text) |
-                df['birthday'].str.lower().str.contains(search_text)
-            ]
-            
-            # Display filtered results
-            for _, row in filtered_df.iterrows():
-                self.contacts_tree.insert("", tk.END, values=(row['name'], row['phone'], row['birthday']))
+            # Filter based on search text using the store's search index
+            self._show_contacts(search_text, keep_position)
             
         except Exception as e:
             print(f"Error filtering contacts: {str(e)}")
     
+    def _show_contacts(self, search_text, keep_position=False):
+        """Point the contacts view at a search, in the current sort order"""
+        with metrics.span("filter", sorted=self._sort_column is not None):
+            self.contacts_query = self.store.query(search_text, self._sort_column)
+            self.contacts_view.set_source(len(self.contacts_query), self.contacts_query.rows,
+                                          keep_position)
+    
     def _sort_contacts(self, column):
         """Sort contacts by column"""
         try:
-            df = pd.read_csv("contacts.csv")
-            df = df.sort_values(by=column)
-            
-            # Clear and repopulate the tree
-            for item in self.contacts_tree.get_children():
-                self.contacts_tree.delete(item)
-            
-            for _, row in df.iterrows():
-                self.contacts_tree.insert("", tk.END, values=(row['name'], row['phone'], row['birthday']))
+            # Sorting happens in the store; only the visible rows are fetched
+            self._sort_column = column
+            self._show_contacts(self.search_var.get())
             
         except Exception as e:
             print(f"Error sorting contacts: {str(e)}")
     
+    def _show_next_days(self):
+        """Show the next N days of birthdays"""
+        self._upcoming_range = None
+        self._refresh_upcoming()
+    
+    def _show_range(self):
+        """Show birthdays between the two picked dates"""
+        start, end = self.range_from.get_date(), self.range_to.get_date()
+        if end < start:
+            # 1 Dec to 15 Jan means next January
+            try:
+                end = end.replace(year=end.year + 1)
+            except ValueError:
+                end = end.replace(year=end.year + 1, day=28)
+        self._upcoming_range = (start, end)
+        self._refresh_upcoming()
+    
     def _refresh_upcoming(self):
         """Refresh upcoming birthdays list"""
-        try:
-            days = int(self.days_var.get())
-        except:
-            days = 30
-            self.days_var.set("30")
-        
-        # Clear current display
-        for item in self.upcoming_tree.get_children():
-            self.upcoming_tree.delete(item)
+        today = datetime.now().date()
+        if self._upcoming_range:
+            start, end = self._upcoming_range
+        else:
+            try:
+                days = int(self.days_var.get())
+            except:
+                days = 30
+                self.days_var.set("30")
+            start, end = today, today + timedelta(days=days)
         
         try:
-            df = pd.read_csv("contacts.csv")
-            today = datetime.now()
-            current_year = today.year
-            
-            upcoming = []
-            for _, row in df.iterrows():
-                bday = datetime.strptime(f"{row['birthday']} {current_year}", "%d-%b %Y")
-                if bday < today:  # If birthday has passed this year, look at next year
-                    bday = bday.replace(year=current_year + 1)
+            with metrics.span("upcoming"):
+                # Birthdays in date order from the store's sorted day-of-year index
+                upcoming, dates = self.store.between(start, end)
                 
-                days_until = (bday - today).days
-                if days_until <= days:
-                    upcoming.append((row['name'], row['birthday'], days_until))
-            
-            # Sort by days until birthday
-            upcoming.sort(key=lambda x: x[2])
-            
-            # Display upcoming birthdays
-            for name, birthday, days_until in upcoming:
-                self.upcoming_tree.insert("", tk.END, values=(name, birthday, days_until))
+                # Display upcoming birthdays
+                self.upcoming_rows.update(zip(upcoming.index,
+                                              zip(upcoming['name'], upcoming['birthday'],
+                                                  [f"{when:%a} {self._get_date_str(when)}" for when in dates],
+                                                  [(when - today).days for when in dates])))
             
         except Exception as e:
             print(f"Error refreshing upcoming birthdays: {str(e)}")
@@ -563,26 +576,21 @@ class BirthdayViewer:
     def refresh_all(self):
         """Refresh all displays"""
         # Refresh today's birthdays
-        for item in self.today_tree.get_children():
-            self.today_tree.delete(item)
-        
         try:
-            df = pd.read_csv("contacts.csv")
-            today = datetime.now()
-            today_str = self._get_date_str(today)
+            # Look up today's bucket in the birthday index
+            with metrics.span("refresh_today"):
+                birthday_people = self.store.birthdays_on(datetime.now().date())
             
-            # Filter today's birthdays
-            birthday_people = df[df['birthday'].str.lower() == today_str.lower()]
+            self.today_rows.update(zip(birthday_people.index,
+                                       zip(birthday_people['name'], birthday_people['phone'])))
             
             if len(birthday_people) == 0:
                 self.status_label.config(text="No birthdays today!")
             else:
-                for _, person in birthday_people.iterrows():
-                    self.today_tree.insert("", tk.END, values=(person['name'], person['phone']))
                 self.status_label.config(text=f"Found {len(birthday_people)} birthday(s) today!")
             
             # Refresh other views
-            self._filter_contacts()
+            self._filter_contacts(keep_position=True)
             self._refresh_upcoming()
             
         except Exception as e:
@@ -613,6 +621,11 @@ class BirthdayViewer:
         if not available_cakes:
             messagebox.showerror("Error", "No cake templates found in 'cakes' directory!")
             return None
+        
+        # Pre-scaled previews, dropping entries for changed or removed templates
+        cake_paths = [os.path.join(cakes_dir, f) for f in available_cakes]
+        thumbnails = ThumbnailCache(os.path.join(cakes_dir, ".thumbnails"))
+        thumbnails.prune(cake_paths)
 
         # Show cake selection dialog
         cake_window = tk.Toplevel(self.root)
@@ -638,7 +651,12 @@ class BirthdayViewer:
         )
         
         canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
+        
+        def on_scroll(*args):
+            scrollbar.set(*args)
+            prioritize_visible()
+        
+        canvas.configure(yscrollcommand=on_scroll)
         
         # Title
         title = ttk.Label(scrollable_frame, 
@@ -655,43 +673,76 @@ class BirthdayViewer:
         current_row.pack(fill=tk.X, expand=True)
         col = 0
         
-        for cake_file in available_cakes:
-            cake_path = os.path.join(cakes_dir, cake_file)
-            try:
-                # Load and resize cake image for preview
-                img = Image.open(cake_path)
-                img = img.resize((200, 150), Image.Resampling.LANCZOS)
-                photo = ImageTk.PhotoImage(img)
-                
-                # Create frame for each cake option
-                cake_frame = ttk.Frame(current_row, style="Custom.TFrame")
-                cake_frame.pack(side=tk.LEFT, padx=10, pady=10)
-                
-                # Add image and button
-                img_label = ttk.Label(cake_frame, image=photo, background=self.colors['off_white'])
-                img_label.image = photo
-                img_label.pack(padx=5, pady=5)
-                
-                select_btn = ttk.Button(cake_frame, 
-                                      text=f"Select {cake_file}",
-                                      style="Custom.TButton",
-                                      command=lambda p=cake_path: select_cake(p))
-                select_btn.pack(pady=5)
-                
-                # Update position and create new row if needed
-                col += 1
-                if col >= 3:  # 3 cakes per row
-                    col = 0
-                    current_row = ttk.Frame(cakes_container, style="Custom.TFrame")
-                    current_row.pack(fill=tk.X, expand=True)
-                    
-            except Exception as e:
-                print(f"Error loading cake template {cake_file}: {str(e)}")
+        # Every tile starts with a blank placeholder; previews fill in as they load
+        placeholder = tk.PhotoImage(width=THUMB_SIZE[0], height=THUMB_SIZE[1])
+        tiles = {}
+        
+        for cake_file, cake_path in zip(available_cakes, cake_paths):
+            # Create frame for each cake option
+            cake_frame = ttk.Frame(current_row, style="Custom.TFrame")
+            cake_frame.pack(side=tk.LEFT, padx=10, pady=10)
+            
+            # Add image and button
+            img_label = ttk.Label(cake_frame, image=placeholder, background=self.colors['off_white'])
+            img_label.image = placeholder
+            img_label.pack(padx=5, pady=5)
+            tiles[cake_path] = (current_row, cake_frame, img_label)
+            
+            select_btn = ttk.Button(cake_frame, 
+                                  text=f"Select {cake_file}",
+                                  style="Custom.TButton",
+                                  command=lambda p=cake_path: select_cake(p))
+            select_btn.pack(pady=5)
+            
+            # Update position and create new row if needed
+            col += 1
+            if col >= 3:  # 3 cakes per row
+                col = 0
+                current_row = ttk.Frame(cakes_container, style="Custom.TFrame")
+                current_row.pack(fill=tk.X, expand=True)
         
         # Pack canvas and scrollbar
         canvas.pack(side="left", fill="both", expand=True)
         scrollbar.pack(side="right", fill="y")
         
+        # Decode previews off the Tk thread
+        loader = ThumbnailLoader(thumbnails, cake_paths)
+        
+        def prioritize_visible():
+            """Ask the loader for the tiles currently scrolled into view first"""
+            top = canvas.canvasy(0)
+            bottom = top + canvas.winfo_height()
+            visible = []
+            for path, (row, frame, _) in tiles.items():
+                y = cakes_container.winfo_y() + row.winfo_y() + frame.winfo_y()
+                if y + frame.winfo_height() >= top and y <= bottom:
+                    visible.append(path)
+            loader.prioritize(visible)
+        
+        def poll_thumbnails():
+            """Move finished previews from the worker queue onto their tiles"""
+            if not cake_window.winfo_exists():
+                return
+            try:
+                while True:
+                    path, img, error = loader.results.get_nowait()
+                    if error is not None:
+                        print(f"Error loading cake template {path}: {str(error)}")
+                        continue
+                    photo = ImageTk.PhotoImage(img)
+                    img_label = tiles[path][2]
+                    img_label.configure(image=photo)
+                    img_label.image = photo
+            except queue.Empty:
+                pass
+            cake_window.after(50, poll_thumbnails)
+        
+        cake_window.bind("<Destroy>", lambda e: loader.stop() if e.widget is cake_window else None)
+        cake_window.update_idletasks()
+        prioritize_visible()
+        loader.start()
+        poll_thumbnails()
+        
         # Wait for selection
         cake_window.wait_window()
         
@@ -699,46 +750,13 @@ class BirthdayViewer:
             return None
             
         try:
-            img = Image.open(selected_cake['path'])
+            # Font size scales with template width (800 is the base width),
+            # with an outline for better visibility
+            img = render_card(name, selected_cake['path'], font_size=60, base_width=800,
+                              outline_width=2, outline_color='black')
         except Exception as e:
             messagebox.showerror("Error", f"Error loading cake template: {str(e)}")
             return None
-
-        draw = ImageDraw.Draw(img)
-        
-        try:
-            # Adjust font size based on image dimensions
-            base_font_size = 60
-            # Scale font size based on image width
-            font_size = int(base_font_size * (img.width / 800))  # 800 is the base width
-            font = ImageFont.truetype("arial.ttf", font_size)
-        except:
-            font = ImageFont.load_default()
-
-        message = f"Happy Birthday\n{name}!"
-        
-        # Get text size
-        text_bbox = draw.textbbox((0, 0), message, font=font)
-        text_width = text_bbox[2] - text_bbox[0]
-        text_height = text_bbox[3] - text_bbox[1]
-        
-        # Calculate position (center of image)
-        x = (img.width - text_width) // 2
-        y = (img.height - text_height) // 2
-        
-        # Add text with outline for better visibility
-        outline_color = 'black'
-        outline_width = 2
-        
-        # Draw text outline
-        for offset_x in range(-outline_width, outline_width + 1):
-            for offset_y in range(-outline_width, outline_width + 1):
-                if offset_x != 0 or offset_y != 0:
-                    draw.text((x + offset_x, y + offset_y), message, 
-                            fill=outline_color, font=font, align="center")
-        
-        # Draw main text
-        draw.text((x, y), message, fill='white', font=font, align="center")
         
         return img
     
@@ -811,6 +829,7 @@ class BirthdayViewer:
             self.status_label.config(text=f"Skipped birthday wishes for {name}")
 
 def main():
+    metrics.configure_from_env()
     root = tk.Tk()
     app = BirthdayViewer(root)
     root.mainloop()
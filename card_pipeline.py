@@ -0,0 +1,194 @@
+import io
+import os
+import time
+import atexit
+import shutil
+import tempfile
+import metrics
+
+# Output formats: optimized PNG, palette-quantized PNG, JPEG and WebP
+FORMATS = ("png", "png8", "jpeg", "webp")
+DEFAULT_QUALITY = 85
+
+SPOOL_PREFIX = "birthday-spool-"
+# Spools from dead processes older than this are swept on Windows, where we
+# cannot safely probe whether the owning process is still alive
+STALE_SPOOL_SECONDS = 24 * 60 * 60
+
+
+class Card:
+    """An encoded birthday card held in memory"""
+
+    def __init__(self, name, data, fmt="png"):
+        self.name = name
+        self.data = data
+        self.format = fmt
+
+    @property
+    def extension(self):
+        return {"jpeg": "jpg", "png8": "png"}.get(self.format, self.format)
+
+    def __len__(self):
+        return len(self.data)
+
+
+def encode_card(img, fmt="png", quality=DEFAULT_QUALITY, max_dim=None):
+    """Encode a PIL image to bytes in one of FORMATS
+
+    ``max_dim`` caps the longest side before encoding. JPEG has no alpha
+    channel, so transparent areas are flattened onto white.
+    """
+    # PIL is imported on first use so the CLI can start without loading it
+    from PIL import Image
+
+    if fmt not in FORMATS:
+        raise ValueError(f"Unknown card format {fmt!r}; expected one of {', '.join(FORMATS)}")
+    if max_dim and max(img.size) > max_dim:
+        img = img.copy()
+        img.thumbnail((max_dim, max_dim), Image.Resampling.LANCZOS)
+
+    buffer = io.BytesIO()
+    if fmt == "png":
+        img.save(buffer, format="PNG", optimize=True)
+    elif fmt == "png8":
+        img.quantize(colors=256, method=Image.Quantize.FASTOCTREE).save(
+            buffer, format="PNG", optimize=True)
+    elif fmt == "jpeg":
+        if img.mode in ("RGBA", "LA", "P"):
+            img = img.convert("RGBA")
+            flat = Image.new("RGB", img.size, "white")
+            flat.paste(img, mask=img.getchannel("A"))
+            img = flat
+        img.save(buffer, format="JPEG", quality=quality, optimize=True, progressive=True)
+    else:
+        img.save(buffer, format="WEBP", quality=quality, method=4)
+    return buffer.getvalue()
+
+
+def make_card(name, template_path, font_path="arial.ttf", fmt="png",
+              quality=DEFAULT_QUALITY, max_dim=None, **render_options):
+    """Render and encode a card for one person"""
+    from card_renderer import render_card
+
+    img = render_card(name, template_path, font_path=font_path, **render_options)
+    with metrics.span("encode", format=fmt) as span:
+        data = encode_card(img, fmt, quality, max_dim)
+        span.add_bytes(len(data))
+    return Card(name, data, fmt)
+
+
+def _render_job(job):
+    """Render and encode one card; runs inside a pool worker"""
+    name, template_path, font_path, fmt, quality, max_dim = job
+    return make_card(name, template_path, font_path=font_path, fmt=fmt,
+                     quality=quality, max_dim=max_dim).data
+
+
+def render_batch(names, template_path, font_path="arial.ttf", workers=None,
+                 fmt="png", quality=DEFAULT_QUALITY, max_dim=None):
+    """Render cards for many names across a process pool
+
+    Returns Cards in the same order as ``names``. Each worker keeps its own
+    template and font caches, so the template is decoded once per worker
+    rather than once per card. ``workers=1`` renders in-process.
+    """
+    jobs = [(name, template_path, font_path, fmt, quality, max_dim) for name in names]
+    with metrics.span("render_batch", format=fmt) as span:
+        if workers == 1 or len(jobs) <= 1:
+            encoded = [_render_job(job) for job in jobs]
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+
+            workers = min(workers or os.cpu_count() or 1, len(jobs))
+            chunksize = max(1, len(jobs) // (workers * 4))
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                encoded = list(pool.map(_render_job, jobs, chunksize=chunksize))
+        span.add_bytes(sum(len(data) for data in encoded))
+    metrics.count("cards_rendered", len(encoded), format=fmt)
+    return [Card(name, data, fmt) for name, data in zip(names, encoded)]
+
+
+def default_spool_root():
+    """Prefer tmpfs for spooled cards, falling back to the system temp dir"""
+    if os.path.isdir("/dev/shm") and os.access("/dev/shm", os.W_OK):
+        return "/dev/shm"
+    return tempfile.gettempdir()
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def sweep_stale_spools(root=None):
+    """Remove spool directories left behind by runs that were killed"""
+    root = root or default_spool_root()
+    try:
+        entries = os.listdir(root)
+    except OSError:
+        return
+    for entry in entries:
+        if not entry.startswith(SPOOL_PREFIX):
+            continue
+        path = os.path.join(root, entry)
+        try:
+            pid = int(entry[len(SPOOL_PREFIX):].split("-", 1)[0])
+        except ValueError:
+            continue
+        if pid == os.getpid():
+            continue
+        if os.name == "nt":
+            try:
+                stale = time.time() - os.path.getmtime(path) > STALE_SPOOL_SECONDS
+            except OSError:
+                continue
+        else:
+            stale = not _pid_alive(pid)
+        if stale:
+            shutil.rmtree(path, ignore_errors=True)
+
+
+class Spool:
+    """Private scratch directory for transports that need a real file path
+
+    The directory lives on tmpfs when available and is only readable by the
+    current user. Each card gets a unique name, is written under a partial
+    name and renamed into place, and the whole directory is removed when
+    the spool is closed or the interpreter exits.
+    """
+
+    def __init__(self, root=None):
+        root = root or default_spool_root()
+        sweep_stale_spools(root)
+        self.path = tempfile.mkdtemp(prefix=f"{SPOOL_PREFIX}{os.getpid()}-", dir=root)
+        atexit.register(self.close)
+
+    def materialize(self, card):
+        """Write a card to a uniquely named file and return its path"""
+        fd, partial = tempfile.mkstemp(prefix=".partial-", dir=self.path)
+        with os.fdopen(fd, "wb") as f:
+            f.write(card.data)
+        path = partial.replace(".partial-", "card-") + "." + card.extension
+        os.replace(partial, path)
+        return path
+
+    def release(self, path):
+        """Delete a materialized card once the transport is done with it"""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def close(self):
+        shutil.rmtree(self.path, ignore_errors=True)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
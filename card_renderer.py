@@ -0,0 +1,93 @@
+import os
+from functools import lru_cache
+from PIL import Image, ImageDraw, ImageFont
+import metrics
+
+# Decoded templates and fonts kept in memory; a decoded template is several MB
+CACHE_SIZE = 32
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _decode_template(path, mtime_ns, size):
+    """Decode a template; the file's mtime and size are part of the key so an
+    edited or replaced file is decoded again"""
+    with metrics.span("template_decode"), Image.open(path) as img:
+        return img.convert("RGBA")
+
+
+def load_template(path):
+    """Return the decoded RGBA base image for a template, decoding it once per version
+
+    The cached image is shared; callers must copy it before drawing.
+    """
+    path = os.path.abspath(path)
+    st = os.stat(path)
+    return _decode_template(path, st.st_mtime_ns, st.st_size)
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def load_font(path, size):
+    """Return a font by (path, size), falling back to Pillow's default"""
+    try:
+        return ImageFont.truetype(path, size)
+    except OSError:
+        # Sized so the fallback still supports stroked text
+        return ImageFont.load_default(size)
+
+
+def cache_stats():
+    """Return hit/miss counters for the template and font caches"""
+    templates = _decode_template.cache_info()
+    fonts = load_font.cache_info()
+    return {
+        "template_hits": templates.hits,
+        "template_misses": templates.misses,
+        "templates_cached": templates.currsize,
+        "font_hits": fonts.hits,
+        "font_misses": fonts.misses,
+        "fonts_cached": fonts.currsize,
+    }
+
+
+def clear_caches():
+    """Drop all cached templates and fonts"""
+    _decode_template.cache_clear()
+    load_font.cache_clear()
+
+
+def draw_outlined_text(draw, xy, text, font, fill="white",
+                       outline_width=0, outline_color="black"):
+    """Draw text with an outline in a single pass using Pillow's stroke support"""
+    draw.text(xy, text, fill=fill, font=font, align="center",
+              stroke_width=outline_width, stroke_fill=outline_color)
+
+
+def render_card(name, template_path, font_path="arial.ttf", font_size=60,
+                base_width=None, text_color="white", outline_width=0, outline_color="black"):
+    """Render a personalized birthday card and return it as a PIL image
+
+    When ``base_width`` is given, the font size is scaled by the template's
+    width relative to it.
+    """
+    img = load_template(template_path).copy()
+    draw = ImageDraw.Draw(img)
+
+    if base_width:
+        font_size = int(font_size * (img.width / base_width))
+    font = load_font(font_path, font_size)
+
+    message = f"Happy Birthday\n{name}!"
+
+    with metrics.span("text_draw"):
+        # Center the text on the image
+        text_bbox = draw.textbbox((0, 0), message, font=font)
+        text_width = text_bbox[2] - text_bbox[0]
+        text_height = text_bbox[3] - text_bbox[1]
+        x = (img.width - text_width) // 2
+        y = (img.height - text_height) // 2
+
+        # Outline the text for better visibility
+        draw_outlined_text(draw, (x, y), message, font, fill=text_color,
+                           outline_width=outline_width, outline_color=outline_color)
+    return img
+
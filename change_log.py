@@ -0,0 +1,234 @@
+import os
+import json
+import hashlib
+
+ADD = "add"
+UPDATE = "update"
+DELETE = "delete"
+
+
+class ChangeLogConflict(ValueError):
+    """The base CSV changed under a change log that cannot be matched to it"""
+
+
+def base_digest(data):
+    """Fingerprint of the base CSV bytes a change log applies to"""
+    return hashlib.sha1(data).hexdigest()
+
+
+def log_path(path):
+    """Change log that sits next to a contacts CSV"""
+    return path + ".log"
+
+
+def lock_path(path):
+    """Lock file that serializes writers of a contacts CSV across processes"""
+    return path + ".lock"
+
+
+class FileLock:
+    """Exclusive lock shared by every process that opens the same lock file
+
+    Used as a context manager. Not reentrant: callers guard it with their
+    own thread lock.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._file = None
+
+    def __enter__(self):
+        f = open(self.path, "a+b")
+        try:
+            if os.name == "nt":
+                import msvcrt
+
+                f.seek(0)
+                while True:
+                    try:
+                        msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+                        break
+                    except OSError:
+                        # LK_LOCK gives up after ten seconds; keep waiting
+                        continue
+            else:
+                import fcntl
+
+                fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        except BaseException:
+            f.close()
+            raise
+        self._file = f
+        return self
+
+    def __exit__(self, *exc):
+        f, self._file = self._file, None
+        try:
+            if os.name == "nt":
+                import msvcrt
+
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+            else:
+                import fcntl
+
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+        finally:
+            f.close()
+        return False
+
+
+def fsync_dir(path):
+    """Make a rename in ``path``'s directory durable (no-op on Windows)"""
+    if os.name == "nt":
+        return
+    fd = os.open(os.path.dirname(os.path.abspath(path)), os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def replay(changes):
+    """Collapse logged changes into (deleted ids, {id: fields} updates, {id: fields} adds)
+
+    Ids are contact ids: those of the base CSV's id column (its row
+    positions for a file without one), or of rows added by an earlier
+    change. Adds keep their log order.
+    """
+    deleted = set()
+    updates = {}
+    adds = {}
+    for change in changes:
+        contact_id = change["id"]
+        if change["op"] == ADD:
+            adds[contact_id] = change["fields"]
+        elif change["op"] == UPDATE:
+            if contact_id in adds:
+                adds[contact_id] = change["fields"]
+            else:
+                updates[contact_id] = change["fields"]
+        elif change["op"] == DELETE:
+            if contact_id in adds:
+                del adds[contact_id]
+            else:
+                deleted.add(contact_id)
+                updates.pop(contact_id, None)
+    return deleted, updates, adds
+
+
+class ChangeLog:
+    """Append-only, fsynced log of contact changes on top of a base CSV
+
+    The first line records the digest of the base CSV the log applies to.
+    Before compaction renames the new base into place it appends a marker
+    naming that base's digest, so a log left behind by a crash is known to
+    be folded in and is ignored. Any other mismatch means the base was
+    edited by hand: changes are then replayed by contact id, which the id
+    column keeps stable, or refused with ChangeLogConflict when the base
+    has no ids to match them by. A torn last line from a crash mid-append
+    is skipped.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.count = 0
+        self._digest = None
+        self._active = False
+        self._torn = False
+
+    def read(self, digest, by_id=False):
+        """Return the changes that apply to a base with this digest
+
+        ``by_id`` says the base has stable contact ids, so changes logged
+        against an earlier version of it can still be replayed.
+        """
+        self._digest = digest
+        self.count = 0
+        self._active = False
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                text = f.read()
+        except FileNotFoundError:
+            return []
+        lines = text.splitlines()
+        try:
+            header = json.loads(lines[0]) if lines else {}
+        except ValueError:
+            header = {}
+        if not isinstance(header, dict) or "base" not in header:
+            # Not a change log: the next append starts a fresh one
+            return []
+        changes = []
+        compacted = None
+        for line in lines[1:]:
+            try:
+                record = json.loads(line)
+            except ValueError:
+                continue
+            if "compacted" in record:
+                compacted = record["compacted"]
+            elif "op" in record:
+                changes.append(record)
+        if header["base"] != digest:
+            if compacted == digest or not changes:
+                # Already folded into this base; the next append starts a fresh log
+                return []
+            if not by_id:
+                raise ChangeLogConflict(
+                    f"{self.path} holds {len(changes)} change(s) for a different version of the "
+                    f"contacts file, which has no id column to match them by. Restore the "
+                    f"contacts file, or delete {self.path} to discard the changes.")
+        self._active = True
+        # A crash mid-append leaves no trailing newline; start the next record on a fresh line
+        self._torn = not text.endswith("\n")
+        self.count = len(changes)
+        return changes
+
+    def append(self, op, contact_id, fields=None):
+        """Durably record one change before it is applied"""
+        self.append_many([(op, contact_id, fields)])
+
+    def append_many(self, changes):
+        """Durably record (op, id, fields) changes with a single fsync"""
+        if self._active:
+            mode, lines = "a", [""] if self._torn else []
+        else:
+            mode, lines = "w", [json.dumps({"base": self._digest})]
+        count = 0
+        for op, contact_id, fields in changes:
+            count += 1
+            record = {"op": op, "id": contact_id}
+            if fields is not None:
+                record["fields"] = fields
+            lines.append(json.dumps(record, ensure_ascii=False))
+        self._write(mode, lines)
+        self._active = True
+        self._torn = False
+        self.count += count
+
+    def _write(self, mode, lines):
+        with open(self.path, mode, encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        if mode == "w":
+            fsync_dir(self.path)
+
+    def mark_compacted(self, digest):
+        """Record that the changes are being folded into a base with this digest"""
+        if not self._active:
+            return
+        self._write("a", ([""] if self._torn else []) + [json.dumps({"compacted": digest})])
+        self._torn = False
+
+    def reset(self, digest):
+        """Drop the log once its changes are part of a base with this digest"""
+        self._digest = digest
+        self.count = 0
+        self._active = False
+        self._torn = False
+        try:
+            os.remove(self.path)
+        except FileNotFoundError:
+            pass
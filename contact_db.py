@@ -0,0 +1,388 @@
+import os
+import sqlite3
+import argparse
+import threading
+from datetime import date, timedelta
+from contact_index import parse_birthday, date_ordinals, month_day
+from contact_search import GRAM, normalize_text, phone_digits, _phone_query
+from contact_store import COLUMNS, read_contacts
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS contacts (
+    id          INTEGER PRIMARY KEY,
+    name        TEXT NOT NULL,
+    phone       TEXT NOT NULL,
+    birthday    TEXT NOT NULL,
+    timezone    TEXT,
+    birth_month INTEGER,
+    birth_day   INTEGER,
+    name_key    TEXT NOT NULL,
+    phone_key   TEXT NOT NULL,
+    haystack    TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS contacts_birthday ON contacts (birth_month, birth_day);
+CREATE INDEX IF NOT EXISTS contacts_name ON contacts (name_key);
+CREATE INDEX IF NOT EXISTS contacts_phone ON contacts (phone_key);
+CREATE INDEX IF NOT EXISTS contacts_timezone ON contacts (timezone);
+"""
+
+# Substring search index; needs SQLite 3.34+ for the trigram tokenizer
+FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS contacts_fts USING fts5(
+    haystack, content='contacts', content_rowid='id', tokenize='trigram');
+CREATE TRIGGER IF NOT EXISTS contacts_fts_insert AFTER INSERT ON contacts BEGIN
+    INSERT INTO contacts_fts (rowid, haystack) VALUES (new.id, new.haystack);
+END;
+CREATE TRIGGER IF NOT EXISTS contacts_fts_delete AFTER DELETE ON contacts BEGIN
+    INSERT INTO contacts_fts (contacts_fts, rowid, haystack) VALUES ('delete', old.id, old.haystack);
+END;
+CREATE TRIGGER IF NOT EXISTS contacts_fts_update AFTER UPDATE ON contacts BEGIN
+    INSERT INTO contacts_fts (contacts_fts, rowid, haystack) VALUES ('delete', old.id, old.haystack);
+    INSERT INTO contacts_fts (rowid, haystack) VALUES (new.id, new.haystack);
+END;
+"""
+
+# Columns the viewer sorts by, mapped onto indexed expressions
+SORT_KEYS = {
+    "name": "name_key, id",
+    "phone": "phone_key, id",
+    "birthday": "birth_month, birth_day, id",
+}
+
+
+def _derived(name, phone, birthday):
+    """Indexed columns derived from a contact's fields"""
+    parsed = parse_birthday(birthday)
+    month, day = parsed if parsed else (None, None)
+    digits = phone_digits(phone)
+    # Fields are joined with newlines, which a search box cannot produce, so
+    # a match never spans two fields
+    haystack = "\n".join((normalize_text(name), digits, normalize_text(birthday)))
+    return month, day, normalize_text(name), digits, haystack
+
+
+def _zone_name(value):
+    """A timezone cell as stored: stripped, or None when blank"""
+    return (value.strip() or None) if isinstance(value, str) else None
+
+
+def _date_pairs(when):
+    """(month, day) pairs celebrated on a date, including 29-Feb in non-leap years"""
+    return [month_day(ordinal) for ordinal in date_ordinals(when)]
+
+
+def _fts_phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+class ContactQuery:
+    """A filtered, sorted view of the contacts table, fetched a page at a time"""
+
+    def __init__(self, store, where, params, order):
+        self.store = store
+        self.where = where
+        self.params = params
+        self.order = order
+        self._count = None
+
+    def __len__(self):
+        if self._count is None:
+            self._count = self.store._execute(
+                f"SELECT COUNT(*) FROM contacts WHERE {self.where}", self.params).fetchone()[0]
+        return self._count
+
+    def rows(self, start, stop):
+        """Return (contact id, (name, phone, birthday)) rows for positions start:stop"""
+        cursor = self.store._execute(
+            f"SELECT id, name, phone, birthday FROM contacts WHERE {self.where} "
+            f"ORDER BY {self.order} LIMIT ? OFFSET ?",
+            (*self.params, max(0, stop - start), start))
+        return [(row[0], row[1:]) for row in cursor.fetchall()]
+
+
+class SQLiteContactStore:
+    """Contact store backed by SQLite instead of the contacts CSV
+
+    Offers the same interface as ContactStore, but nothing is held in
+    memory: birthdays on a date and in the next N days are looked up
+    through the (birth_month, birth_day) index, sorting uses the name
+    and phone indexes, and search goes through an FTS5 trigram index
+    (a scan on SQLite builds without it). Results come back as
+    DataFrames indexed by contact id, or as a paged ContactQuery.
+    """
+
+    def __init__(self, path="contacts.db"):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        try:
+            self._db.executescript(FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError:
+            self.has_fts = False
+        self._version = 0
+        self._data_version = None
+
+    def close(self):
+        self._db.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._db:
+            return self._db.execute(sql, params)
+
+    @property
+    def version(self):
+        """Bumped whenever the contacts change, in this process or another"""
+        # data_version only moves for commits made on other connections; our
+        # own writes bump _version directly
+        data_version = self._execute("PRAGMA data_version").fetchone()[0]
+        if data_version != self._data_version:
+            self._data_version = data_version
+            self._version += 1
+        return self._version
+
+    def _changed(self):
+        self._version += 1
+
+    def invalidate(self):
+        """Nothing is cached, so there is nothing to drop"""
+
+    def _frame(self, rows):
+        import pandas as pd
+
+        df = pd.DataFrame.from_records(rows, columns=["id", *COLUMNS, "timezone"])
+        return df.set_index("id").rename_axis(None)
+
+    def _select(self, where, params=(), order="id"):
+        return self._execute(
+            f"SELECT id, name, phone, birthday, timezone FROM contacts WHERE {where} ORDER BY {order}",
+            params).fetchall()
+
+    def load(self):
+        """Return every contact as a DataFrame; prefer the indexed queries below"""
+        return self._frame(self._select("1"))
+
+    def _birthday_where(self, pairs):
+        clause = " OR ".join("(birth_month = ? AND birth_day = ?)" for _ in pairs)
+        return clause, [value for pair in pairs for value in pair]
+
+    def birthday_rows(self, when=None):
+        """Return (ids, {column: list}) for birthdays on a date, without pandas"""
+        where, params = self._birthday_where(_date_pairs(when or date.today()))
+        rows = self._select(where, params)
+        columns = {"name": [], "phone": [], "birthday": [], "timezone": []}
+        for row in rows:
+            for column, value in zip(columns.values(), row[1:]):
+                column.append(value)
+        return [row[0] for row in rows], columns
+
+    def birthdays_on(self, when=None):
+        """Return contacts whose birthday falls on the date"""
+        where, params = self._birthday_where(_date_pairs(when or date.today()))
+        return self._frame(self._select(where, params))
+
+    def _between(self, start, end, limit=None):
+        """Return (rows, dates) for birthdays from start to end inclusive, in date order"""
+        offsets = {}
+        for offset in range(min((end - start).days, 366) + 1):
+            for pair in _date_pairs(start + timedelta(days=offset)):
+                offsets.setdefault(pair, offset)
+        if not offsets:
+            return [], []
+        # One (birth_month, birth_day) index range per calendar month in the window
+        ranges = {}
+        for month, day in offsets:
+            low, high = ranges.get(month, (day, day))
+            ranges[month] = (min(low, day), max(high, day))
+        clause = " OR ".join("(birth_month = ? AND birth_day BETWEEN ? AND ?)" for _ in ranges)
+        rows = self._execute(
+            f"SELECT id, name, phone, birthday, timezone, birth_month, birth_day FROM contacts "
+            f"WHERE {clause}",
+            [value for month, (low, high) in ranges.items() for value in (month, low, high)]).fetchall()
+        # A month can appear at both ends of a year-long window; keep only days inside it
+        rows = [row for row in rows if (row[5], row[6]) in offsets]
+        rows.sort(key=lambda row: (offsets[(row[5], row[6])], row[0]))
+        if limit is not None:
+            rows = rows[:limit]
+        dates = [start + timedelta(days=offsets[(row[5], row[6])]) for row in rows]
+        return [row[:5] for row in rows], dates
+
+    def between(self, start, end, limit=None):
+        """Return (contacts, dates) for birthdays from start to end inclusive, in date order"""
+        rows, dates = self._between(start, end, limit)
+        return self._frame(rows), dates
+
+    def between_rows(self, start, end):
+        """Return (ids, {column: list}, dates) for a date range, without pandas"""
+        rows, dates = self._between(start, end)
+        columns = {"name": [], "phone": [], "birthday": [], "timezone": []}
+        for row in rows:
+            for column, value in zip(columns.values(), row[1:]):
+                column.append(value)
+        return [row[0] for row in rows], columns, dates
+
+    def upcoming(self, today=None, days=30, limit=None):
+        """Return (contacts, days_until) for birthdays in the next N days, nearest first"""
+        today = today or date.today()
+        contacts, dates = self.between(today, today + timedelta(days=days), limit)
+        return contacts, [(when - today).days for when in dates]
+
+    def _search_where(self, query):
+        query = normalize_text(query)
+        if not query:
+            return "1", ()
+        digits = _phone_query(query)
+        fts = "id IN (SELECT rowid FROM contacts_fts WHERE contacts_fts MATCH ?)"
+        if self.has_fts and len(query) >= GRAM:
+            clause, params = fts, [_fts_phrase(query)]
+        else:
+            # Short queries cannot use trigrams; they match most rows anyway
+            clause, params = "instr(haystack, ?) > 0", [query]
+        if digits:
+            # Phone digits count only against the phone, as in ContactSearch;
+            # the haystack's trigrams narrow the rows to check
+            if self.has_fts and len(digits) >= GRAM:
+                clause += f" OR ({fts} AND instr(phone_key, ?) > 0)"
+                params += [_fts_phrase(digits), digits]
+            else:
+                clause += " OR instr(phone_key, ?) > 0"
+                params.append(digits)
+        return f"({clause})", tuple(params)
+
+    def query(self, text="", sort=None):
+        """Return a paged ContactQuery for a search, optionally sorted by a column"""
+        where, params = self._search_where(text)
+        return ContactQuery(self, where, params, SORT_KEYS.get(sort, "id"))
+
+    def search(self, query):
+        """Return the contacts matching a search query, in store order"""
+        where, params = self._search_where(query)
+        return self._frame(self._select(where, params))
+
+    def timezones(self):
+        """Distinct timezone names in use; None stands for contacts without one"""
+        rows = self._execute("SELECT DISTINCT timezone FROM contacts").fetchall()
+        # Databases imported before values were normalized may still have spaces
+        return {_zone_name(row[0]) for row in rows}
+
+    def get(self, contact_id):
+        """Return the row for a contact id"""
+        df = self._frame(self._select("id = ?", (int(contact_id),)))
+        return df.loc[int(contact_id)]
+
+    def add(self, name, phone, birthday, timezone=None):
+        """Insert a contact and return its id"""
+        cursor = self._execute(
+            "INSERT INTO contacts (name, phone, birthday, timezone, birth_month, birth_day, "
+            "name_key, phone_key, haystack) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (str(name), str(phone), str(birthday), _zone_name(timezone),
+             *_derived(name, phone, birthday)))
+        self._changed()
+        return cursor.lastrowid
+
+    def add_many(self, contacts):
+        """Insert (name, phone, birthday) contacts in one transaction; returns their ids"""
+        rows = [(str(name), str(phone), str(birthday), None, *_derived(name, phone, birthday))
+                for name, phone, birthday in contacts]
+        if not rows:
+            return []
+        with self._lock, self._db:
+            first = self._db.execute("SELECT COALESCE(MAX(id), 0) + 1 FROM contacts").fetchone()[0]
+            self._db.executemany(
+                "INSERT INTO contacts (name, phone, birthday, timezone, birth_month, birth_day, "
+                "name_key, phone_key, haystack) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self._changed()
+        # Rowids are assigned as MAX(id) + 1, in order, within the transaction
+        return list(range(first, first + len(rows)))
+
+    def name_phone_pairs(self, batch_size=10000):
+        """Yield (name, phone) for every contact, a batch at a time"""
+        last = 0
+        while True:
+            rows = self._execute(
+                "SELECT id, name, phone FROM contacts WHERE id > ? ORDER BY id LIMIT ?",
+                (last, batch_size)).fetchall()
+            if not rows:
+                return
+            for _, name, phone in rows:
+                yield name, phone
+            last = rows[-1][0]
+
+    def update(self, contact_id, name, phone, birthday):
+        """Replace the fields of an existing contact"""
+        cursor = self._execute(
+            "UPDATE contacts SET name = ?, phone = ?, birthday = ?, birth_month = ?, birth_day = ?, "
+            "name_key = ?, phone_key = ?, haystack = ? WHERE id = ?",
+            (str(name), str(phone), str(birthday), *_derived(name, phone, birthday), int(contact_id)))
+        if not cursor.rowcount:
+            raise KeyError(contact_id)
+        self._changed()
+
+    def delete(self, contact_id):
+        """Remove a contact"""
+        cursor = self._execute("DELETE FROM contacts WHERE id = ?", (int(contact_id),))
+        if not cursor.rowcount:
+            raise KeyError(contact_id)
+        self._changed()
+
+    def import_csv(self, csv_path, batch_size=10000):
+        """Copy every contact from a contacts CSV (and its change log); returns the count"""
+        contacts = read_contacts(csv_path)
+        timezones = contacts.get("timezone") or [None] * len(contacts["name"])
+        rows = zip(contacts["name"], contacts["phone"], contacts["birthday"], timezones)
+        count = 0
+        batch = []
+        for name, phone, birthday, timezone in rows:
+            batch.append((name, phone, birthday, _zone_name(timezone),
+                          *_derived(name, phone, birthday)))
+            if len(batch) >= batch_size:
+                count += self._insert_many(batch)
+                batch = []
+        if batch:
+            count += self._insert_many(batch)
+        return count
+
+    def _insert_many(self, rows):
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT INTO contacts (name, phone, birthday, timezone, birth_month, birth_day, "
+                "name_key, phone_key, haystack) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        self._changed()
+        return len(rows)
+
+
+def migrate(csv_path="contacts.csv", db_path="contacts.db", replace=False):
+    """One-shot copy of a contacts CSV into a new SQLite database; returns the count"""
+    if os.path.exists(db_path):
+        if not replace:
+            raise FileExistsError(f"{db_path} already exists; pass replace=True to overwrite it")
+        for suffix in ("", "-wal", "-shm"):
+            try:
+                os.remove(db_path + suffix)
+            except FileNotFoundError:
+                pass
+    store = SQLiteContactStore(db_path)
+    try:
+        return store.import_csv(csv_path)
+    finally:
+        store.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate contacts.csv into a SQLite database")
+    parser.add_argument("csv", nargs="?", default="contacts.csv")
+    parser.add_argument("db", nargs="?", default="contacts.db")
+    parser.add_argument("--replace", action="store_true", help="overwrite an existing database")
+    args = parser.parse_args()
+    try:
+        count = migrate(args.csv, args.db, args.replace)
+    except (FileExistsError, FileNotFoundError) as e:
+        raise SystemExit(f"Error: {str(e)}")
+    print(f"Migrated {count} contact(s) from {args.csv} to {args.db}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,269 @@
+import os
+import csv
+import hashlib
+import argparse
+from contact_index import MONTH_ABBRS, parse_birthday
+from contact_store import COLUMNS, default_contacts_path, open_store
+
+DEFAULT_COUNTRY = "1"
+# Digits in a national number for the default country, without its code
+NATIONAL_LENGTH = 10
+# E.164 allows at most 15 digits; shorter than 8 is never a full number
+MIN_DIGITS = 8
+MAX_DIGITS = 15
+CHUNK_SIZE = 50000
+DEDUP_KEYS = ("contact", "phone")
+
+
+class InvalidContact(ValueError):
+    """A contact row that cannot be imported"""
+
+
+class DuplicateContact(InvalidContact):
+    """A contact that is already in the store or earlier in the import"""
+
+
+def normalize_phone(value, default_country=DEFAULT_COUNTRY):
+    """Return a phone number in E.164 form ('+14695869362'), or raise InvalidContact
+
+    Numbers written with '+' or '00' are taken as international. A bare
+    national number of NATIONAL_LENGTH digits gets the default country
+    code; longer bare numbers are assumed to already include one.
+    """
+    text = str(value).strip()
+    digits = "".join(c for c in text if c.isdigit())
+    if not digits:
+        raise InvalidContact("missing phone number")
+    if text.startswith("+"):
+        pass
+    elif text.startswith("00"):
+        digits = digits[2:]
+    elif len(digits) == NATIONAL_LENGTH:
+        digits = default_country + digits
+    elif len(digits) < NATIONAL_LENGTH:
+        raise InvalidContact(f"phone number {text!r} is too short")
+    if not MIN_DIGITS <= len(digits) <= MAX_DIGITS or digits[0] == "0":
+        raise InvalidContact(f"phone number {text!r} is not a valid international number")
+    return "+" + digits
+
+
+def normalize_birthday(value):
+    """Return a birthday in the contacts.csv 'd-Mon' form ('7-Mar'), or raise InvalidContact"""
+    parsed = parse_birthday(value)
+    if parsed is None:
+        raise InvalidContact(f"invalid birthday {str(value)!r}")
+    month, day = parsed
+    return f"{day}-{MONTH_ABBRS[month - 1].title()}"
+
+
+def clean_contact(name, phone, birthday, default_country=DEFAULT_COUNTRY):
+    """Validate and normalize one contact; returns (name, phone, birthday)"""
+    name = " ".join(str(name).split())
+    if not name:
+        raise InvalidContact("missing name")
+    return (name, normalize_phone(phone, default_country), normalize_birthday(birthday))
+
+
+def _fingerprint(key):
+    """8-byte hash of a dedup key, much smaller to keep than the key itself"""
+    return int.from_bytes(hashlib.blake2b(key.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+class ContactImporter:
+    """Validates, normalizes and de-duplicates contacts on their way into a store
+
+    Duplicates are detected by hashing either name plus phone
+    (``dedup="contact"``) or the phone alone (``dedup="phone"``), against
+    both the store's existing contacts and earlier rows of the same
+    import. One pass is O(N) time. Memory is O(N) too: one 8-byte
+    fingerprint per stored contact and per imported row, held in dicts.
+
+    The fingerprints of the store are counted the first time a duplicate
+    check needs them and then kept up to date by this importer's own
+    ``add``, ``update``, ``delete`` and imports; they are only counted
+    again when something else changes the store.
+    """
+
+    def __init__(self, store, default_country=DEFAULT_COUNTRY, dedup="contact"):
+        if dedup not in DEDUP_KEYS:
+            raise ValueError(f"Unknown dedup key {dedup!r}; expected one of {', '.join(DEDUP_KEYS)}")
+        self.store = store
+        self.default_country = default_country
+        self.dedup = dedup
+        self._seen = None
+        self._seen_version = None
+
+    def _key(self, name, phone):
+        if self.dedup == "phone":
+            return phone
+        return f"{phone}|{name.casefold()}"
+
+    def _contact_fingerprint(self, name, phone):
+        """Fingerprint of a stored contact, or None if its phone is not valid"""
+        try:
+            name, phone, _ = clean_contact(name, phone, "01-Jan", self.default_country)
+        except InvalidContact:
+            return None
+        return _fingerprint(self._key(name, phone))
+
+    def _seen_keys(self):
+        """{fingerprint: how many stored contacts have it}, recounted when the store
+        was changed by someone else"""
+        version = self.store.version
+        if self._seen is None or version != self._seen_version:
+            seen = {}
+            for name, phone in self.store.name_phone_pairs():
+                fingerprint = self._contact_fingerprint(name, phone)
+                if fingerprint is not None:
+                    seen[fingerprint] = seen.get(fingerprint, 0) + 1
+            self._seen = seen
+            self._seen_version = self.store.version
+        return self._seen
+
+    def _synced(self, before, writes=1):
+        """After our own writes, whether the store changed only by them; if so the
+        counts stay valid once the caller applies those writes"""
+        version = self.store.version
+        if self._seen_version != before or version != before + writes:
+            return False
+        self._seen_version = version
+        return True
+
+    def _count(self, fingerprint, change):
+        if fingerprint is None:
+            return
+        count = self._seen.get(fingerprint, 0) + change
+        if count > 0:
+            self._seen[fingerprint] = count
+        else:
+            self._seen.pop(fingerprint, None)
+
+    def add(self, name, phone, birthday):
+        """Validate and add one contact; returns its id or raises InvalidContact"""
+        contact = clean_contact(name, phone, birthday, self.default_country)
+        fingerprint = _fingerprint(self._key(contact[0], contact[1]))
+        if fingerprint in self._seen_keys():
+            raise DuplicateContact("duplicate of an existing contact")
+        before = self.store.version
+        contact_id = self.store.add(*contact)
+        if self._synced(before):
+            self._count(fingerprint, 1)
+        return contact_id
+
+    def update(self, contact_id, name, phone, birthday):
+        """Validate and replace a contact's fields; raises InvalidContact if the new
+        name and phone belong to another contact"""
+        contact = clean_contact(name, phone, birthday, self.default_country)
+        fingerprint = _fingerprint(self._key(contact[0], contact[1]))
+        seen = self._seen_keys()
+        old = self.store.get(contact_id)
+        old_fingerprint = self._contact_fingerprint(old['name'], old['phone'])
+        if fingerprint != old_fingerprint and fingerprint in seen:
+            raise DuplicateContact("duplicate of an existing contact")
+        before = self.store.version
+        self.store.update(contact_id, *contact)
+        if self._synced(before):
+            self._count(old_fingerprint, -1)
+            self._count(fingerprint, 1)
+
+    def delete(self, contact_id):
+        """Remove a contact"""
+        before = self.store.version
+        if self._seen is None or self._seen_version != before:
+            # Nothing counted, or the counts are stale: the next check recounts anyway
+            self.store.delete(contact_id)
+            return
+        old = self.store.get(contact_id)
+        self.store.delete(contact_id)
+        if self._synced(before):
+            self._count(self._contact_fingerprint(old['name'], old['phone']), -1)
+
+    def import_file(self, path, reject_path=None, chunksize=CHUNK_SIZE):
+        """Stream a contacts CSV into the store; returns counts of what happened to each row
+
+        The file is read in chunks with every column as text, so phone
+        numbers keep their '+' and leading zeros. Each chunk is added to
+        the store in one write. Rows that fail validation or are
+        duplicates go to ``reject_path`` with their row number and reason.
+        """
+        import pandas as pd
+
+        reject_path = reject_path or os.path.splitext(path)[0] + ".rejects.csv"
+        summary = {"read": 0, "imported": 0, "rejected": 0, "duplicates": 0}
+        seen = self._seen_keys()
+        before = self.store.version
+        writes = 0
+        # {fingerprint: row number} for this file, to name the row a duplicate repeats
+        rows = {}
+        rejects = None
+        try:
+            chunks = pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunksize,
+                                 skipinitialspace=True)
+            for chunk in chunks:
+                missing = [column for column in COLUMNS if column not in chunk.columns]
+                if missing:
+                    raise ValueError(f"{path} has no {', '.join(missing)} column")
+                accepted = []
+                for row, name, phone, birthday in zip(chunk.index + 1, chunk['name'],
+                                                      chunk['phone'], chunk['birthday']):
+                    summary["read"] += 1
+                    try:
+                        contact = clean_contact(name, phone, birthday, self.default_country)
+                        fingerprint = _fingerprint(self._key(contact[0], contact[1]))
+                        if fingerprint in rows:
+                            raise DuplicateContact(f"duplicate of row {rows[fingerprint]}")
+                        if fingerprint in seen:
+                            raise DuplicateContact("duplicate of an existing contact")
+                        rows[fingerprint] = int(row)
+                    except InvalidContact as e:
+                        if rejects is None:
+                            rejects = open(reject_path, "w", newline="", encoding="utf-8")
+                            writer = csv.writer(rejects)
+                            writer.writerow(["row", *COLUMNS, "reason"])
+                        writer.writerow([row, name, phone, birthday, str(e)])
+                        summary["duplicates" if isinstance(e, DuplicateContact) else "rejected"] += 1
+                        continue
+                    accepted.append(contact)
+                if accepted:
+                    self.store.add_many(accepted)
+                    writes += 1
+                summary["imported"] += len(accepted)
+        finally:
+            if rejects is not None:
+                rejects.close()
+        if self._synced(before, writes):
+            for fingerprint in rows:
+                self._count(fingerprint, 1)
+        summary["reject_path"] = reject_path if rejects is not None else None
+        return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="birthday_automation.py import",
+                                     description="Import contacts from a CSV file")
+    parser.add_argument("file", help="CSV with name, phone and birthday columns")
+    parser.add_argument("--into", default=None,
+                        help="contact store to import into (default: contacts.db if migrated, else contacts.csv)")
+    parser.add_argument("--rejects", default=None,
+                        help="where to write rejected rows (default: <file>.rejects.csv)")
+    parser.add_argument("--country", default=DEFAULT_COUNTRY,
+                        help="calling code for numbers written without one (default: 1)")
+    parser.add_argument("--dedup", choices=DEDUP_KEYS, default="contact",
+                        help="treat rows as duplicates by name and phone, or by phone alone")
+    parser.add_argument("--chunksize", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args(argv)
+
+    store = open_store(args.into or default_contacts_path())
+    importer = ContactImporter(store, args.country, args.dedup)
+    try:
+        summary = importer.import_file(args.file, args.rejects, args.chunksize)
+    except (OSError, ValueError) as e:
+        raise SystemExit(f"Error importing contacts: {str(e)}")
+    print(f"Read {summary['read']} row(s): imported {summary['imported']}, "
+          f"rejected {summary['rejected']}, skipped {summary['duplicates']} duplicate(s)")
+    if summary["reject_path"]:
+        print(f"Rejected rows written to {summary['reject_path']}")
+
+
+if __name__ == "__main__":
+    main()
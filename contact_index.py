@@ -0,0 +1,188 @@
+import bisect
+import calendar
+import itertools
+from datetime import date, timedelta
+
+# Month names are fixed here instead of using strftime('%b') so parsing
+# does not depend on the current locale
+MONTH_ABBRS = ["jan", "feb", "mar", "apr", "may", "jun",
+               "jul", "aug", "sep", "oct", "nov", "dec"]
+MONTH_NAMES = ["january", "february", "march", "april", "may", "june", "july",
+               "august", "september", "october", "november", "december"]
+MONTHS = {name: i + 1 for i, name in enumerate(MONTH_ABBRS)}
+MONTHS.update({name: i + 1 for i, name in enumerate(MONTH_NAMES)})
+
+# Days per month in a leap year, so every birthday (including 29-Feb) has a slot
+DAYS_IN_MONTH = [31, 29, 31, 30, 31, 30, 31, 31, 30, 31, 30, 31]
+MONTH_OFFSETS = [sum(DAYS_IN_MONTH[:i]) for i in range(12)]
+DAYS_IN_INDEX = sum(DAYS_IN_MONTH)  # 366
+
+
+def parse_birthday(value):
+    """Parse a birthday string into (month, day), or None if it is not valid
+
+    Accepts the 'DD-MMM' format used by contacts.csv ('17-Mar', '1-mar',
+    '01-March') as well as 'MM-DD' and 'YYYY-MM-DD'.
+    """
+    if not isinstance(value, str):
+        return None
+    parts = value.strip().lower().replace("/", "-").split("-")
+    try:
+        if len(parts) == 2 and parts[1] in MONTHS:
+            month, day = MONTHS[parts[1]], int(parts[0])
+        elif len(parts) == 2 and parts[0] in MONTHS:
+            month, day = MONTHS[parts[0]], int(parts[1])
+        elif len(parts) == 2:
+            month, day = int(parts[0]), int(parts[1])
+        elif len(parts) == 3 and len(parts[0]) == 4:
+            month, day = int(parts[1]), int(parts[2])
+        else:
+            return None
+    except ValueError:
+        return None
+    if not 1 <= month <= 12 or not 1 <= day <= DAYS_IN_MONTH[month - 1]:
+        return None
+    return month, day
+
+
+def birthday_ordinal(month, day):
+    """Map (month, day) onto 0..365 using a leap-year calendar"""
+    return MONTH_OFFSETS[month - 1] + day - 1
+
+
+def month_day(ordinal):
+    """Inverse of birthday_ordinal: map 0..365 back to (month, day)"""
+    month = 12
+    while MONTH_OFFSETS[month - 1] > ordinal:
+        month -= 1
+    return month, ordinal - MONTH_OFFSETS[month - 1] + 1
+
+
+FEB_28 = birthday_ordinal(2, 28)
+FEB_29 = birthday_ordinal(2, 29)
+
+
+def date_ordinals(when):
+    """Return the birthday ordinals celebrated on the given date
+
+    People born on 29-Feb celebrate on 28-Feb in non-leap years.
+    """
+    ordinal = birthday_ordinal(when.month, when.day)
+    if ordinal == FEB_28 and not calendar.isleap(when.year):
+        return (FEB_28, FEB_29)
+    return (ordinal,)
+
+
+def occurrence_date(year, ordinal):
+    """Date a birthday ordinal is celebrated on in a year (29-Feb moves to 28-Feb)"""
+    month, day = month_day(ordinal)
+    if ordinal == FEB_29 and not calendar.isleap(year):
+        day = 28
+    return date(year, month, day)
+
+
+def year_segments(start, end):
+    """Split start..end into (year, low ordinal, high ordinal) pieces, one per calendar year
+
+    Ranges are inclusive. In a non-leap year a piece ending on 28-Feb also
+    takes in 29-Feb birthdays, which are celebrated that day.
+    """
+    for year in range(start.year, end.year + 1):
+        first = start if year == start.year else date(year, 1, 1)
+        last = end if year == end.year else date(year, 12, 31)
+        high = birthday_ordinal(last.month, last.day)
+        if high == FEB_28 and not calendar.isleap(year):
+            high = FEB_29
+        yield year, birthday_ordinal(first.month, first.day), high
+
+
+class BirthdayIndex:
+    """Birthdays bucketed by day of year, built once per contacts load and
+    then kept up to date with ``add`` and ``remove``
+
+    Rows are referred to by key: their position in the sequence the index
+    was built from (so callers can map results back with ``df.iloc``), or
+    the matching entry of ``keys``, such as contact ids. ``ordinals`` maps
+    each key to its day of year, -1 for an unreadable birthday. The
+    buckets double as the rows in day-of-year order for date ranges.
+    """
+
+    def __init__(self, birthdays, keys=None):
+        self.ordinals = {}
+        self.buckets = [[] for _ in range(DAYS_IN_INDEX)]
+        self.invalid = []
+        if keys is None:
+            keys = itertools.count()
+        for key, value in zip(keys, birthdays):
+            ordinal = self._ordinal(value)
+            self.ordinals[key] = ordinal
+            (self.invalid if ordinal < 0 else self.buckets[ordinal]).append(key)
+
+    def __len__(self):
+        return len(self.ordinals)
+
+    @staticmethod
+    def _ordinal(value):
+        parsed = parse_birthday(value)
+        return -1 if parsed is None else birthday_ordinal(*parsed)
+
+    def add(self, key, birthday):
+        """Index a new row, or move an existing one to its new birthday"""
+        if key in self.ordinals:
+            self.remove(key)
+        ordinal = self._ordinal(birthday)
+        self.ordinals[key] = ordinal
+        bisect.insort(self.invalid if ordinal < 0 else self.buckets[ordinal], key)
+
+    def remove(self, key):
+        ordinal = self.ordinals.pop(key)
+        (self.invalid if ordinal < 0 else self.buckets[ordinal]).remove(key)
+
+    def positions_on(self, when=None):
+        """Return the keys of everyone whose birthday falls on the date"""
+        when = when or date.today()
+        ordinals = date_ordinals(when)
+        if len(ordinals) == 1:
+            return list(self.buckets[ordinals[0]])
+        return sorted(p for o in ordinals for p in self.buckets[o])
+
+    def between(self, start, end, limit=None):
+        """Return (positions, dates) for birthdays from start to end inclusive, in date order
+
+        The buckets already hold the rows in day-of-year order, so a range
+        is read by walking just the buckets it covers: O(days + k) for k
+        results, never touching the other rows. Ranges may wrap the year
+        ('1-Dec' to '15-Jan'). A range of a year or more lists everyone
+        once, at their first occurrence. Birthdays on the same day keep
+        row order.
+        """
+        end = min(end, start + timedelta(days=366))
+        seen = set() if (end - start).days >= 365 else None
+        found_positions, found_dates = [], []
+        for year, low, high in year_segments(start, end):
+            leap = calendar.isleap(year)
+            for ordinal in range(low, high + 1):
+                day = self.buckets[ordinal]
+                if not leap and ordinal == FEB_28 and high >= FEB_29:
+                    # 29-Feb birthdays are celebrated on 28-Feb this year
+                    day = sorted(day + self.buckets[FEB_29])
+                elif not leap and ordinal == FEB_29:
+                    continue
+                if not day:
+                    continue
+                if seen is not None:
+                    day = [position for position in day if position not in seen]
+                    seen.update(day)
+                if limit is not None:
+                    day = day[:limit - len(found_positions)]
+                found_positions.extend(day)
+                found_dates.extend([occurrence_date(year, ordinal)] * len(day))
+                if limit is not None and len(found_positions) >= limit:
+                    return found_positions, found_dates
+        return found_positions, found_dates
+
+    def upcoming(self, today=None, days=30, limit=None):
+        """Return (positions, days_until) for birthdays in the next N days"""
+        today = today or date.today()
+        positions, dates = self.between(today, today + timedelta(days=days), limit)
+        return positions, [(when - today).days for when in dates]
@@ -0,0 +1,131 @@
+from array import array
+
+GRAM = 3
+PHONE_CHARS = set("0123456789 +-().")
+
+
+def normalize_text(value):
+    """Case-fold a field for matching"""
+    return str(value).casefold()
+
+
+def phone_digits(value):
+    """Strip a phone number down to its digits"""
+    return "".join(c for c in str(value) if c.isdigit())
+
+
+def _phone_query(query):
+    """Return the digits of a query that looks like a phone number, else None"""
+    if query and set(query) <= PHONE_CHARS:
+        digits = phone_digits(query)
+        if digits and digits != query:
+            return digits
+    return None
+
+
+def _intersect(postings):
+    """Intersect sorted posting arrays, smallest first"""
+    postings = sorted(postings, key=len)
+    result = postings[0]
+    for other in postings[1:]:
+        lookup = set(other)
+        result = [p for p in result if p in lookup]
+        if not result:
+            break
+    return result
+
+
+class ContactSearch:
+    """Trigram index over normalized name, phone digits and birthday
+
+    Built once per contacts load and then kept up to date with ``add`` and
+    ``remove``. Queries of three or more characters intersect trigram
+    postings and verify the survivors; shorter queries fall back to a scan
+    over the prebuilt haystacks. A query that extends the previous one
+    only re-checks the previous hits.
+
+    Rows are referred to by key: their position in the sequence the index
+    was built from, or the matching entry of ``keys`` (such as contact
+    ids, in increasing order). Results come back in that order.
+    """
+
+    def __init__(self, names, phones, birthdays, keys=None):
+        self.haystacks = {}
+        self.phones = {}
+        self.grams = {}
+        if keys is None:
+            keys = range(len(names))
+        for key, name, phone, birthday in zip(keys, names, phones, birthdays):
+            self.add(key, name, phone, birthday)
+        self._last_query = None
+        self._last_result = None
+
+    def __len__(self):
+        return len(self.haystacks)
+
+    def add(self, key, name, phone, birthday):
+        """Index a new row, or re-index an existing one in place
+
+        New keys must be larger than any already added. An edited row's old
+        postings stay behind and are filtered out by the final check.
+        """
+        digits = phone_digits(phone)
+        haystack = "\0".join((normalize_text(name), digits, normalize_text(birthday)))
+        self.haystacks[key] = haystack
+        self.phones[key] = digits
+        for gram in {haystack[i:i + GRAM] for i in range(len(haystack) - GRAM + 1)}:
+            if "\0" in gram:
+                continue
+            posting = self.grams.get(gram)
+            if posting is None:
+                posting = self.grams[gram] = array("i")
+            posting.append(key)
+        self._last_query = None
+
+    def remove(self, key):
+        """Drop a row; its postings are left behind like an edited row's"""
+        del self.haystacks[key]
+        del self.phones[key]
+        self._last_query = None
+
+    def _matches(self, key, query, digits):
+        haystack = self.haystacks.get(key)
+        return haystack is not None and (query in haystack or (
+            digits is not None and digits in self.phones[key]))
+
+    def _candidates(self, query, digits):
+        """Return candidate keys for a query from the trigram index"""
+        candidates = set()
+        for term in (query, digits):
+            if term is None:
+                continue
+            postings = []
+            for i in range(len(term) - GRAM + 1):
+                posting = self.grams.get(term[i:i + GRAM])
+                if posting is None:
+                    postings = None
+                    break
+                postings.append(posting)
+            if postings:
+                candidates.update(_intersect(postings))
+        return sorted(candidates)
+
+    def search(self, query):
+        """Return keys of contacts matching the query"""
+        query = normalize_text(query)
+        if not query:
+            result = list(self.haystacks)
+        else:
+            digits = _phone_query(query)
+            last = self._last_query
+            if last and last in query and (_phone_query(last) or not digits):
+                # Every match for the longer query also matched the previous one
+                candidates = self._last_result
+            elif len(query) >= GRAM and (digits is None or len(digits) >= GRAM):
+                candidates = self._candidates(query, digits)
+            else:
+                candidates = self.haystacks
+            result = [p for p in candidates if self._matches(p, query, digits)]
+        self._last_query = query
+        self._last_result = result
+        return result
@@ -0,0 +1,511 @@
+import io
+import os
+import csv
+import shutil
+import tempfile
+import threading
+from datetime import date
+import metrics
+from contact_index import BirthdayIndex
+from contact_search import ContactSearch, normalize_text, phone_digits
+from change_log import (ADD, UPDATE, DELETE, ChangeLog, ChangeLogConflict, FileLock, base_digest,
+                        fsync_dir, lock_path, log_path, replay)
+
+COLUMNS = ["name", "phone", "birthday"]
+# Column of the base CSV holding each contact's id, written by compaction
+ID_COLUMN = "id"
+# Fold the change log into the base CSV once it holds this many changes
+COMPACT_EVERY = 500
+# Sort keys for the viewer's columns, matching the SQLite store's name_key and phone_key
+SORT_KEYS = {"name": normalize_text, "phone": phone_digits}
+# Database suffixes that select the SQLite backend in open_store
+DB_SUFFIXES = (".db", ".sqlite", ".sqlite3")
+
+
+def default_contacts_path(directory="."):
+    """Use contacts.db once contacts have been migrated to it, else contacts.csv"""
+    db_path = os.path.join(directory, "contacts.db")
+    return db_path if os.path.exists(db_path) else os.path.join(directory, "contacts.csv")
+
+
+def open_store(path="contacts.csv"):
+    """Open the contact store for a CSV file or a SQLite database"""
+    if path.lower().endswith(DB_SUFFIXES):
+        from contact_db import SQLiteContactStore
+        return SQLiteContactStore(path)
+    return ContactStore(path)
+
+
+def read_birthdays(path, when=None):
+    """Return (ids, {column: list}) for birthdays on a date, without pandas"""
+    when = when or date.today()
+    if path.lower().endswith(DB_SUFFIXES):
+        from contact_db import SQLiteContactStore
+        with metrics.span("today_lookup", backend="sqlite"):
+            store = SQLiteContactStore(path)
+            try:
+                return store.birthday_rows(when)
+            finally:
+                store.close()
+    with metrics.span("load_contacts", backend="csv"):
+        contacts = read_contacts(path)
+    with metrics.span("today_lookup", backend="csv"):
+        positions = BirthdayIndex(contacts['birthday']).positions_on(when)
+        return positions, select_rows(contacts, positions)
+
+
+def read_birthdays_between(path, start, end):
+    """Return (ids, {column: list}, dates) for birthdays from start to end, in date order"""
+    if path.lower().endswith(DB_SUFFIXES):
+        from contact_db import SQLiteContactStore
+        store = SQLiteContactStore(path)
+        try:
+            return store.between_rows(start, end)
+        finally:
+            store.close()
+    contacts = read_contacts(path)
+    positions, dates = BirthdayIndex(contacts['birthday']).between(start, end)
+    return positions, select_rows(contacts, positions), dates
+
+
+def _read_base(path):
+    """Return the raw bytes of a base CSV, or None if it does not exist"""
+    try:
+        with open(path, "rb") as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _assign_ids(values, size, taken=()):
+    """Contact ids for the rows of a base CSV
+
+    ``values`` is its id column, or None for a file without one, whose rows
+    are numbered by position. Rows with no valid, unique id (added by hand)
+    get the next free ids in file order, after every id in the file and in
+    ``taken``, so every process numbers them the same way.
+    """
+    if values is None:
+        return list(range(size))
+    ids = []
+    used = set()
+    missing = []
+    for position, value in enumerate(values):
+        try:
+            contact_id = int(value)
+        except (TypeError, ValueError):
+            contact_id = -1
+        if contact_id < 0 or contact_id in used:
+            missing.append(position)
+            ids.append(None)
+            continue
+        used.add(contact_id)
+        ids.append(contact_id)
+    next_id = max(max(used, default=-1), max(taken, default=-1)) + 1
+    for position in missing:
+        ids[position] = next_id
+        next_id += 1
+    return ids
+
+
+def read_contacts(path):
+    """Read the contacts CSV into {column: list of str} with the csv module
+
+    Much cheaper to import and run than pandas, for callers that only need
+    to look up today's birthdays. Values are kept exactly as written, with
+    any pending change log merged in.
+    """
+    data = _read_base(path)
+    if data is None:
+        raise FileNotFoundError(f"No such file: {path!r}")
+    reader = csv.reader(io.StringIO(data.decode("utf-8-sig"), newline=""))
+    header = next(reader, [])
+    columns = {column: [] for column in header}
+    lists = list(columns.values())
+    for row in reader:
+        if not row:
+            continue
+        for i, values in enumerate(lists):
+            values.append(row[i] if i < len(row) else "")
+    for column in COLUMNS:
+        columns.setdefault(column, [])
+
+    id_values = columns.pop(ID_COLUMN, None)
+    try:
+        changes = ChangeLog(log_path(path)).read(base_digest(data), by_id=id_values is not None)
+    except ChangeLogConflict:
+        if _read_base(path) == data:
+            raise
+        # A writer replaced the base between reading it and its log
+        return read_contacts(path)
+    if changes:
+        ids = _assign_ids(id_values, len(columns["name"]), (change["id"] for change in changes))
+        columns = _merge_columns(columns, ids, changes)
+    return columns
+
+
+def _merge_columns(columns, ids, changes):
+    """Apply logged changes to a read_contacts table whose rows have these ids"""
+    deleted, updates, adds = replay(changes)
+    positions = {contact_id: position for position, contact_id in enumerate(ids)}
+    # An add replayed onto a base that already has it is an update
+    for contact_id in [contact_id for contact_id in adds if contact_id in positions]:
+        updates[contact_id] = adds.pop(contact_id)
+    for contact_id, fields in updates.items():
+        if contact_id in positions:
+            for column in COLUMNS:
+                columns[column][positions[contact_id]] = fields[column]
+    keep = [i for i, contact_id in enumerate(ids) if contact_id not in deleted]
+    merged = {column: [values[i] for i in keep] for column, values in columns.items()}
+    for fields in adds.values():
+        for column, values in merged.items():
+            values.append(str(fields.get(column, "")))
+    return merged
+
+
+def select_rows(columns, positions):
+    """Return the rows at ``positions`` of a read_contacts table"""
+    return {column: [values[p] for p in positions] for column, values in columns.items()}
+
+
+def _merge_frame(df, changes):
+    """Apply logged changes to a contacts DataFrame indexed by contact id"""
+    import pandas as pd
+
+    deleted, updates, adds = replay(changes)
+    # An add replayed onto a base that already has it is an update
+    for contact_id in [contact_id for contact_id in adds if contact_id in df.index]:
+        updates[contact_id] = adds.pop(contact_id)
+    if deleted:
+        df = df.drop(index=[contact_id for contact_id in deleted if contact_id in df.index])
+    if updates:
+        df = df.astype({"phone": object})
+        for contact_id, fields in updates.items():
+            if contact_id in df.index:
+                df.loc[contact_id, COLUMNS] = [fields[column] for column in COLUMNS]
+    if adds:
+        added = pd.DataFrame([[fields[column] for column in COLUMNS] for fields in adds.values()],
+                             columns=COLUMNS, index=list(adds))
+        df = pd.concat([df, added])
+    return df
+
+
+class FrameQuery:
+    """A filtered, sorted contacts frame, fetched a window at a time"""
+
+    def __init__(self, df):
+        self.df = df
+
+    def __len__(self):
+        return len(self.df)
+
+    def rows(self, start, stop):
+        """Return (contact id, (name, phone, birthday)) rows for positions start:stop"""
+        window = self.df.iloc[start:stop]
+        return list(zip(window.index, zip(window['name'], window['phone'], window['birthday'])))
+
+
+class ContactStore:
+    """In-process cache of the contacts CSV shared by all views
+
+    The file is parsed again only when it or its change log changes. Edits
+    are appended to the change log (``contacts.csv.log``) and fsynced
+    before the cached frame is updated, so a single change costs O(1) I/O
+    however large the address book is. Readers always see the base CSV
+    with the log merged in.
+
+    Once the log holds ``compact_every`` changes a background thread folds
+    it into the base: the new CSV is written to a temporary file and
+    renamed over the old one, then the log is removed. Edits made while a
+    compaction runs wait for it to finish; reads use the cached frame.
+    Writers in other processes (the viewer, an import, the CLI) take turns
+    through ``contacts.csv.lock`` and reload before writing, so they never
+    hand out the same id.
+
+    Each row's DataFrame index label is its contact id. Compaction writes
+    the ids to an ``id`` column of the CSV, so an id names the same contact
+    across reloads, compactions and other processes' writes, and the log
+    can still be replayed after the file is edited by hand. Rows added by
+    hand without an id get the next free ones. The first edit of a CSV
+    without the column rewrites it with one.
+    """
+
+    def __init__(self, path="contacts.csv", compact_every=COMPACT_EVERY):
+        self.path = path
+        self.compact_every = compact_every
+        self.version = 0
+        self._df = None
+        self._signature = None
+        self._index = None
+        self._search = None
+        self._log = ChangeLog(log_path(path))
+        self._lock = threading.RLock()
+        self._file_lock = FileLock(lock_path(path))
+        self._compactor = None
+        self._next_id = 0
+        # Whether the base CSV has an id column (a missing file counts)
+        self._stable_ids = True
+
+    def _stat(self):
+        """Return the (mtime, size) signatures of the base file and its log"""
+        signature = []
+        for path in (self.path, self._log.path):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                signature.append(None)
+                continue
+            signature.append((st.st_mtime_ns, st.st_size))
+        return tuple(signature)
+
+    def _set(self, df, signature):
+        self._df = df
+        self._signature = signature
+        self._index = None
+        self._search = None
+        self.version += 1
+
+    def invalidate(self):
+        """Force the next load to re-read the file"""
+        self._df = None
+
+    def _read(self, signature):
+        """Parse the base CSV and merge the change log into it"""
+        import pandas as pd
+
+        with metrics.span("load_contacts", backend="csv") as span:
+            data = _read_base(self.path)
+            if data is None:
+                data = b""
+                df = pd.DataFrame(columns=COLUMNS + [ID_COLUMN])
+            else:
+                # Everything is text: parsing phones as integers would drop '+' and leading zeros
+                df = pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False)
+            span.add_bytes(len(data))
+            id_values = df.pop(ID_COLUMN).tolist() if ID_COLUMN in df.columns else None
+            try:
+                changes = self._log.read(base_digest(data), by_id=id_values is not None)
+            except ChangeLogConflict:
+                if _read_base(self.path) == data:
+                    raise
+                # A writer replaced the base between reading it and its log
+                return self._read(self._stat())
+            logged = [change["id"] for change in changes]
+            df.index = _assign_ids(id_values, len(df), logged)
+            if changes:
+                df = _merge_frame(df, changes)
+            if not df.index.is_monotonic_increasing:
+                df = df.sort_index(kind="stable")
+        # Ids are never reused, even those of contacts added and deleted since the last compaction
+        self._next_id = max(int(df.index.max()) if len(df) else -1, max(logged, default=-1)) + 1
+        self._stable_ids = id_values is not None
+        self._set(df, signature)
+
+    def load(self):
+        """Return the contacts DataFrame, reloading only if the files changed"""
+        if not self._lock.acquire(blocking=self._df is None):
+            # A compaction is rewriting the files; the cached frame is current
+            return self._df
+        try:
+            signature = self._stat()
+            if self._df is None or signature != self._signature:
+                self._read(signature)
+            return self._df
+        finally:
+            self._lock.release()
+
+    @property
+    def index(self):
+        """Birthday index keyed by contact id, built once per load and kept up to date by edits"""
+        df = self.load()
+        if self._index is None:
+            self._index = BirthdayIndex(df['birthday'], df.index)
+        return self._index
+
+    def _search_ids(self, query):
+        df = self.load()
+        if self._search is None:
+            self._search = ContactSearch(df['name'], df['phone'], df['birthday'], df.index)
+        return self._search.search(query)
+
+    def search(self, query):
+        """Return the contacts matching a search query, in store order"""
+        if not normalize_text(query):
+            # Everyone matches; no need for the trigram index
+            return self.load()
+        return self.load().loc[self._search_ids(query)]
+
+    def query(self, text="", sort=None):
+        """Return a FrameQuery for a search, optionally sorted by a column"""
+        if sort == "birthday":
+            # By day of year rather than the 'd-Mon' text, as the SQLite store
+            # sorts; unreadable birthdays come first, like its NULLs
+            df = self.search(text)
+            ordinals = self.index.ordinals
+            return FrameQuery(df.loc[sorted(df.index, key=ordinals.__getitem__)])
+        df = self.search(text)
+        if sort in SORT_KEYS:
+            # Ties keep id order, as the SQLite store's "name_key, id"
+            df = df.sort_values(by=sort, key=lambda column: column.map(SORT_KEYS[sort]), kind="stable")
+        elif sort is not None:
+            df = df.sort_values(by=sort, kind="stable")
+        return FrameQuery(df)
+
+    def birthdays_on(self, when=None):
+        """Return contacts whose birthday falls on the date"""
+        df = self.load()
+        return df.loc[self.index.positions_on(when or date.today())]
+
+    def upcoming(self, today=None, days=30, limit=None):
+        """Return (contacts, days_until) for birthdays in the next N days, nearest first"""
+        df = self.load()
+        ids, days_until = self.index.upcoming(today or date.today(), days, limit)
+        return df.loc[ids], days_until
+
+    def between(self, start, end, limit=None):
+        """Return (contacts, dates) for birthdays from start to end inclusive, in date order"""
+        df = self.load()
+        ids, dates = self.index.between(start, end, limit)
+        return df.loc[ids], dates
+
+    def timezones(self):
+        """Distinct timezone names in use; None stands for contacts without one"""
+        df = self.load()
+        if 'timezone' not in df.columns:
+            return {None} if len(df) else set()
+        return {name.strip() if isinstance(name, str) and name.strip() else None
+                for name in df['timezone'].unique()}
+
+    def get(self, contact_id):
+        """Return the row for a contact id"""
+        return self.load().loc[contact_id]
+
+    def _commit(self, df, removed=(), changed=None):
+        """Install an edited frame whose change is already in the log
+
+        The birthday and search indexes, if built, are updated for the
+        removed ids and the ``changed`` frame of added or edited rows
+        instead of being rebuilt.
+        """
+        index, search = self._index, self._search
+        self._set(df, self._stat())
+        for contact_id in removed:
+            if index is not None:
+                index.remove(contact_id)
+            if search is not None:
+                search.remove(contact_id)
+        if changed is not None:
+            for contact_id, name, phone, birthday in zip(changed.index, changed['name'],
+                                                         changed['phone'], changed['birthday']):
+                if index is not None:
+                    index.add(contact_id, birthday)
+                if search is not None:
+                    search.add(contact_id, name, phone, birthday)
+        self._index, self._search = index, search
+        if self._log.count >= self.compact_every:
+            self._start_compaction()
+
+    def add(self, name, phone, birthday):
+        """Append a contact and return its id"""
+        return self.add_many([(name, phone, birthday)])[0]
+
+    def add_many(self, contacts):
+        """Append (name, phone, birthday) contacts with one log write; returns their ids"""
+        import pandas as pd
+
+        contacts = list(contacts)
+        if not contacts:
+            return []
+        with self._lock, self._file_lock:
+            df = self._load_for_write()
+            ids = list(range(self._next_id, self._next_id + len(contacts)))
+            self._log.append_many(
+                (ADD, contact_id, {"name": name, "phone": phone, "birthday": birthday})
+                for contact_id, (name, phone, birthday) in zip(ids, contacts))
+            self._next_id += len(contacts)
+            new_contacts = pd.DataFrame(contacts, columns=COLUMNS, index=ids)
+            self._commit(pd.concat([df, new_contacts]), changed=new_contacts)
+            return ids
+
+    def name_phone_pairs(self):
+        """Yield (name, phone) for every contact"""
+        df = self.load()
+        return zip(df['name'], df['phone'])
+
+    def update(self, contact_id, name, phone, birthday):
+        """Replace the fields of an existing contact"""
+        with self._lock, self._file_lock:
+            df = self._load_for_write()
+            if contact_id not in df.index:
+                raise KeyError(contact_id)
+            self._log.append(UPDATE, contact_id,
+                             {"name": name, "phone": phone, "birthday": birthday})
+            df = df.astype({"phone": object})
+            df.loc[contact_id, COLUMNS] = [name, phone, birthday]
+            self._commit(df, changed=df.loc[[contact_id]])
+
+    def delete(self, contact_id):
+        """Remove a contact"""
+        with self._lock, self._file_lock:
+            df = self._load_for_write()
+            if contact_id not in df.index:
+                raise KeyError(contact_id)
+            self._log.append(DELETE, contact_id)
+            self._commit(df.drop(index=contact_id), removed=[contact_id])
+
+    def _start_compaction(self):
+        if self._compactor is None or not self._compactor.is_alive():
+            self._compactor = threading.Thread(target=self._compact_in_background, daemon=True)
+            self._compactor.start()
+
+    def _compact_in_background(self):
+        try:
+            self.compact()
+        except Exception as e:
+            print(f"Error compacting contacts: {str(e)}")
+
+    def _load_for_write(self):
+        """Load the contacts to edit them, first giving a CSV without ids its id column"""
+        df = self.load()
+        if not self._stable_ids:
+            self._write_base(df)
+        return df
+
+    def compact(self):
+        """Fold the change log into the base CSV with an atomic rename"""
+        with self._lock, self._file_lock:
+            df = self.load()
+            if self._log.count:
+                self._write_base(df)
+
+    def _write_base(self, df):
+        """Replace the base CSV with the contacts and their ids, then drop the log"""
+        with metrics.span("compact_contacts"):
+            data = df.assign(**{ID_COLUMN: df.index}).to_csv(index=False).encode("utf-8")
+            digest = base_digest(data)
+            fd, temp_path = tempfile.mkstemp(prefix=".contacts-", suffix=".tmp",
+                                             dir=os.path.dirname(os.path.abspath(self.path)))
+            try:
+                with os.fdopen(fd, "wb") as f:
+                    f.write(data)
+                    f.flush()
+                    os.fsync(f.fileno())
+                # mkstemp creates the file private to its owner
+                try:
+                    shutil.copymode(self.path, temp_path)
+                except FileNotFoundError:
+                    os.chmod(temp_path, 0o644)
+                self._log.mark_compacted(digest)
+                os.replace(temp_path, self.path)
+            except BaseException:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+                raise
+            fsync_dir(self.path)
+            # A crash before this point leaves a log marked as compacted into
+            # the new base, which readers then ignore
+            self._log.reset(digest)
+            self._stable_ids = True
+            self._signature = self._stat()
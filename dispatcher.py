@@ -0,0 +1,224 @@
+import time
+import random
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+import metrics
+from transports import TransportError, RateLimited
+
+
+class TokenBucket:
+    """Thread-safe token bucket allowing ``rate`` events per second"""
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.burst
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def try_acquire(self):
+        """Take a token if one is available; else return seconds until one is"""
+        with self._lock:
+            self._refill(time.monotonic())
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def acquire(self, cancelled=None):
+        """Block until a token is taken; returns False if cancelled first"""
+        while True:
+            wait = self.try_acquire()
+            if wait == 0:
+                return True
+            if cancelled is None:
+                time.sleep(wait)
+            elif cancelled.wait(wait):
+                return False
+
+    def set_rate(self, rate):
+        with self._lock:
+            self._refill(time.monotonic())
+            self.rate = rate
+
+
+class SendJob:
+    """One message waiting to be sent"""
+
+    def __init__(self, phone, message, card, name=None, key=None):
+        self.phone = phone
+        self.message = message
+        self.card = card
+        self.name = name or card.name
+        self.key = key
+
+
+class SendResult:
+    """Outcome of a SendJob"""
+
+    def __init__(self, job, ok, error=None, attempts=0, seconds=0.0, cancelled=False):
+        self.job = job
+        self.ok = ok
+        self.error = error
+        self.attempts = attempts
+        self.seconds = seconds
+        self.cancelled = cancelled
+
+
+class Dispatcher:
+    """Send jobs concurrently under global and per-recipient rate limits
+
+    ``rate`` caps messages per second across all workers, and
+    ``per_recipient_rate`` caps them per phone number (None means no
+    limit). Failures back off adaptively. Each consecutive failure doubles
+    a shared pause that all workers honour, or the pause is set from the
+    provider's Retry-After. The global rate is halved on failure and
+    recovers additively on success. Waiting out a rate limit does not use
+    up one of a job's ``max_attempts``; ``max_rate_limited`` bounds how
+    often one job may be turned away.
+    """
+
+    def __init__(self, transport, concurrency=1, rate=None, burst=None,
+                 per_recipient_rate=None, max_attempts=3, base_backoff=1.0, max_backoff=60.0,
+                 cancel_event=None, max_rate_limited=50):
+        self.transport = transport
+        self.concurrency = max(1, concurrency)
+        self.max_rate = rate
+        self.per_recipient_rate = per_recipient_rate
+        self.max_attempts = max_attempts
+        self.max_rate_limited = max_rate_limited
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.stats = {"sent": 0, "failed": 0, "retries": 0, "rate_limited": 0}
+        self._global = TokenBucket(rate, burst) if rate else None
+        self._recipients = {}
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._backoff_until = 0.0
+        self._cancelled = cancel_event or threading.Event()
+
+    def cancel(self):
+        """Stop starting new sends; in-flight sends finish"""
+        self._cancelled.set()
+
+    @property
+    def cancelled(self):
+        return self._cancelled.is_set()
+
+    def _recipient_bucket(self, phone):
+        if not self.per_recipient_rate:
+            return None
+        with self._lock:
+            bucket = self._recipients.get(phone)
+            if bucket is None:
+                bucket = self._recipients[phone] = TokenBucket(self.per_recipient_rate, 1)
+            return bucket
+
+    def _on_success(self):
+        with self._lock:
+            self._failures = 0
+            self.stats["sent"] += 1
+            if self._global and self._global.rate < self.max_rate:
+                self._global.set_rate(min(self.max_rate, self._global.rate + self.max_rate * 0.1))
+
+    def _on_failure(self, retry_after=None):
+        with self._lock:
+            self._failures += 1
+            if retry_after is None:
+                delay = min(self.max_backoff, self.base_backoff * 2 ** (self._failures - 1))
+                delay *= random.uniform(0.5, 1.0)
+            else:
+                delay = retry_after
+            self._backoff_until = max(self._backoff_until, time.monotonic() + delay)
+            if self._global:
+                self._global.set_rate(max(self.max_rate * 0.05, self._global.rate * 0.5))
+
+    def _wait_for_backoff(self):
+        delay = self._backoff_until - time.monotonic()
+        if delay > 0:
+            return not self._cancelled.wait(delay)
+        return not self._cancelled.is_set()
+
+    def send(self, job):
+        """Send one job with retries; blocks until done"""
+        start = time.perf_counter()
+        bucket = self._recipient_bucket(job.phone)
+        attempts = 0
+        limited = 0
+        error = None
+        while attempts < self.max_attempts and limited <= self.max_rate_limited:
+            if not self._wait_for_backoff():
+                break
+            if bucket and not bucket.acquire(self._cancelled):
+                break
+            if self._global and not self._global.acquire(self._cancelled):
+                break
+            attempts += 1
+            try:
+                with metrics.span("send", transport=self.transport.name) as span:
+                    span.add_bytes(len(job.card))
+                    self.transport.send(job.phone, job.message, job.card)
+                self._on_success()
+                metrics.count("messages", transport=self.transport.name, outcome="sent")
+                return SendResult(job, True, attempts=attempts,
+                                  seconds=time.perf_counter() - start)
+            except RateLimited as e:
+                # Turned away before delivery: wait and try again without using an attempt
+                error = e
+                attempts -= 1
+                limited += 1
+                with self._lock:
+                    self.stats["rate_limited"] += 1
+                metrics.count("rate_limited", transport=self.transport.name)
+                self._on_failure(e.retry_after)
+                continue
+            except TransportError as e:
+                error = e
+                self._on_failure()
+            except Exception as e:
+                # A bug or bad input in this job; retrying would fail the same way
+                error = TransportError(f"{type(e).__name__}: {str(e)}")
+                break
+            if attempts < self.max_attempts:
+                with self._lock:
+                    self.stats["retries"] += 1
+                metrics.count("send_retries", transport=self.transport.name)
+        cancelled = self._cancelled.is_set()
+        if attempts or not cancelled:
+            with self._lock:
+                self.stats["failed"] += 1
+        metrics.count("messages", transport=self.transport.name,
+                      outcome="cancelled" if cancelled and not attempts else "failed")
+        return SendResult(job, False, error, attempts, time.perf_counter() - start,
+                          cancelled=cancelled)
+
+    def dispatch(self, jobs, on_result=None):
+        """Send all jobs and return their results in job order
+
+        ``on_result`` is called with each SendResult as it completes.
+        """
+        jobs = list(jobs)
+        results = [None] * len(jobs)
+        if self.concurrency == 1 or len(jobs) <= 1:
+            for i, job in enumerate(jobs):
+                results[i] = self.send(job)
+                if on_result:
+                    on_result(results[i])
+            return results
+        with ThreadPoolExecutor(max_workers=min(self.concurrency, len(jobs))) as pool:
+            futures = {pool.submit(self.send, job): i for i, job in enumerate(jobs)}
+            for future in as_completed(futures):
+                job = jobs[futures[future]]
+                try:
+                    result = future.result()
+                except Exception as e:
+                    # One job must never stop the others being reported
+                    result = SendResult(job, False, TransportError(f"{type(e).__name__}: {str(e)}"))
+                results[futures[future]] = result
+                if on_result:
+                    on_result(result)
+        return results
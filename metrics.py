@@ -0,0 +1,230 @@
+import os
+import json
+import time
+import atexit
+import bisect
+import tempfile
+import threading
+
+# Latency buckets in seconds, from a cached lookup up to a slow WhatsApp Web send
+BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PREFIX = "birthday_"
+# Environment variables that switch metrics on for the GUIs (and the CLI defaults)
+LOG_ENV = "BIRTHDAY_METRICS_LOG"
+PROM_ENV = "BIRTHDAY_METRICS_PROM"
+
+
+class _NullSpan:
+    """Stands in for a Span while metrics are off, so timed code costs one call"""
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def add_bytes(self, count):
+        pass
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class Span:
+    """Times one stage; use as a context manager"""
+
+    __slots__ = ("registry", "name", "labels", "bytes", "start")
+
+    def __init__(self, registry, name, labels):
+        self.registry = registry
+        self.name = name
+        self.labels = labels
+        self.bytes = None
+        self.start = None
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        seconds = time.perf_counter() - self.start
+        self.registry.finish(self, seconds, exc_type.__name__ if exc_type else None)
+        return False
+
+    def add_bytes(self, count):
+        """Attribute bytes (a card, a file) to this stage"""
+        self.bytes = (self.bytes or 0) + count
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    escaped = (value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for _, value in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Registry:
+    """Counters and latency histograms, with a JSON-lines log of every span
+
+    ``log_path`` gets one JSON object per finished span or counted event.
+    ``prom_path`` is rewritten by ``flush`` in the Prometheus text format,
+    for node_exporter's textfile collector; the file is replaced atomically
+    so a scrape never sees half of it.
+    """
+
+    def __init__(self, log_path=None, prom_path=None):
+        self.log_path = log_path
+        self.prom_path = prom_path
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+        self._log = open(log_path, "a", encoding="utf-8", buffering=1) if log_path else None
+
+    def _write(self, record):
+        if self._log is not None:
+            record = {"ts": round(time.time(), 6), "pid": os.getpid(), **record}
+            self._log.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def span(self, name, labels):
+        return Span(self, name, labels)
+
+    def finish(self, span, seconds, error):
+        key = (span.name, _label_key(span.labels))
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = [0] * (len(BUCKETS) + 1) + [0.0]
+            histogram[bisect.bisect_left(BUCKETS, seconds)] += 1
+            histogram[-1] += seconds
+            stage_labels = _label_key({**span.labels, "stage": span.name})
+            if span.bytes is not None:
+                self._add("stage_bytes", stage_labels, span.bytes)
+            if error:
+                self._add("stage_errors", stage_labels, 1)
+            record = {"span": span.name, "seconds": round(seconds, 6), **span.labels}
+            if span.bytes is not None:
+                record["bytes"] = span.bytes
+            if error:
+                record["error"] = error
+            self._write(record)
+
+    def _add(self, name, labels, value):
+        key = (name, labels)
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def count(self, name, value, labels):
+        with self._lock:
+            self._add(name, _label_key(labels), value)
+            self._write({"metric": name, "value": value, **labels})
+
+    def render(self):
+        """Return the metrics in the Prometheus text exposition format"""
+        lines = []
+        with self._lock:
+            counters = sorted(self.counters.items())
+            histograms = sorted((key, list(values)) for key, values in self.histograms.items())
+        declared = set()
+        for (name, labels), value in counters:
+            metric = f"{PREFIX}{name}_total"
+            if metric not in declared:
+                declared.add(metric)
+                lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric}{_format_labels(labels)} {value}")
+        if histograms:
+            metric = f"{PREFIX}stage_seconds"
+            lines.append(f"# HELP {metric} Time spent in each stage")
+            lines.append(f"# TYPE {metric} histogram")
+        for (stage, labels), values in histograms:
+            labels = (("stage", stage),) + labels
+            cumulative = 0
+            for bound, count in zip(BUCKETS + ("+Inf",), values):
+                cumulative += count
+                lines.append(f"{metric}_bucket{_format_labels(labels, [('le', str(bound))])} {cumulative}")
+            lines.append(f"{metric}_sum{_format_labels(labels)} {values[-1]:.6f}")
+            lines.append(f"{metric}_count{_format_labels(labels)} {cumulative}")
+        lines.append(f"# TYPE {PREFIX}metrics_updated_timestamp_seconds gauge")
+        lines.append(f"{PREFIX}metrics_updated_timestamp_seconds {time.time():.3f}")
+        return "\n".join(lines) + "\n"
+
+    def flush(self):
+        """Rewrite the Prometheus textfile, if there is one"""
+        if not self.prom_path:
+            return
+        text = self.render()
+        directory = os.path.dirname(os.path.abspath(self.prom_path))
+        # node_exporter only reads *.prom, so the temp file is never scraped
+        fd, temp_path = tempfile.mkstemp(prefix=".metrics-", suffix=".tmp", dir=directory)
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                f.write(text)
+            # mkstemp makes the file private; the exporter may run as another user
+            os.chmod(temp_path, 0o644)
+            os.replace(temp_path, self.prom_path)
+        except BaseException:
+            try:
+                os.remove(temp_path)
+            except OSError:
+                pass
+            raise
+
+    def close(self):
+        self.flush()
+        if self._log is not None:
+            self._log.close()
+            self._log = None
+
+
+_registry = None
+
+
+def configure(log_path=None, prom_path=None):
+    """Turn metrics on, or off when neither path is given
+
+    Until this is called every function here is a no-op, and ``span``
+    hands back a shared do-nothing object.
+    """
+    global _registry
+    if _registry is not None:
+        _registry.close()
+    _registry = Registry(log_path, prom_path) if log_path or prom_path else None
+    return _registry
+
+
+def configure_from_env():
+    """Configure from BIRTHDAY_METRICS_LOG and BIRTHDAY_METRICS_PROM"""
+    return configure(os.environ.get(LOG_ENV) or None, os.environ.get(PROM_ENV) or None)
+
+
+def enabled():
+    return _registry is not None
+
+
+def span(name, **labels):
+    """Time a stage: ``with metrics.span("render", format="png") as s: ...``"""
+    if _registry is None:
+        return _NULL_SPAN
+    return _registry.span(name, labels)
+
+
+def count(name, value=1, **labels):
+    """Add to the counter ``birthday_<name>_total``"""
+    if _registry is not None:
+        _registry.count(name, value, labels)
+
+
+def flush():
+    """Write the Prometheus textfile now; also done at exit"""
+    if _registry is not None:
+        try:
+            _registry.flush()
+        except OSError as e:
+            print(f"Error writing metrics: {str(e)}")
+
+
+atexit.register(flush)
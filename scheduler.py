@@ -0,0 +1,177 @@
+import time
+import signal
+import threading
+from datetime import datetime, timedelta, time as dtime
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+
+def parse_send_at(text):
+    """Parse an 'HH:MM' local send time"""
+    hours, minutes = text.split(":")
+    return dtime(int(hours), int(minutes))
+
+
+def load_zone(name, default=None):
+    """Return a ZoneInfo for a timezone name, or ``default`` (None is the local
+    zone) when the name is empty or unknown"""
+    if not isinstance(name, str) or not name.strip():
+        return default
+    try:
+        return ZoneInfo(name.strip())
+    except (ZoneInfoNotFoundError, ValueError):
+        print(f"Unknown timezone {name!r}, using {default or 'local time'}")
+        return default
+
+
+def _rows(people, mask):
+    """The rows of a contacts frame where mask is true, keeping its columns when none are"""
+    return people.iloc[[position for position, keep in enumerate(mask) if keep]]
+
+
+class BirthdayScheduler:
+    """Long-running loop that sends wishes at each contact's local morning
+
+    Contacts come from a contact store (CSV or SQLite), which only does
+    work when the contacts change, so its indexes stay warm between days. An optional
+    ``timezone`` column groups contacts by IANA zone; everyone else, and
+    anyone whose zone is not recognised, uses ``default_zone`` (None means
+    the machine's local time). Once a zone's
+    local clock passes ``send_at``, ``run_day(people, day)`` is called with
+    that zone's birthdays for its local date. ``run_day`` returns the time
+    of its next scheduled retry, or None.
+
+    SIGTERM and SIGINT stop the loop and cancel in-flight sending; SIGHUP
+    forces a contacts reload and an immediate pass.
+    """
+
+    def __init__(self, store, run_day, send_at=dtime(9, 0), default_zone=None, max_sleep=900):
+        self.store = store
+        self.run_day = run_day
+        self.send_at = send_at
+        self.default_zone = default_zone
+        self.max_sleep = max_sleep
+        self.stopping = threading.Event()
+        self._wake = threading.Event()
+        self._zones_version = None
+        self._zones = {}
+        self._handled = {}
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, lambda *_: self.stop())
+        signal.signal(signal.SIGINT, lambda *_: self.stop())
+        if hasattr(signal, "SIGHUP"):
+            signal.signal(signal.SIGHUP, lambda *_: self.reload())
+
+    def stop(self):
+        self.stopping.set()
+        self._wake.set()
+
+    def reload(self):
+        """Drop the cached contacts and re-check every zone now"""
+        self.store.invalidate()
+        self._handled.clear()
+        self._wake.set()
+
+    def zones(self):
+        """Return {zone key: (zone, timezone names)} for the current contacts"""
+        names = self.store.timezones()
+        if self._zones_version != self.store.version:
+            self._zones = {}
+            for name in names:
+                zone = load_zone(name, self.default_zone)
+                zone_key = str(zone) if zone else None
+                self._zones.setdefault(zone_key, (zone, set()))[1].add(name)
+            self._zones_version = self.store.version
+        return self._zones
+
+    def _zone_mask(self, people, names):
+        """Which rows of a contacts frame have a timezone that is one of names"""
+        if 'timezone' not in people.columns:
+            return [None in names] * len(people)
+        return [(name.strip() if isinstance(name, str) and name.strip() else None) in names
+                for name in people['timezone']]
+
+    def _people_in_zone(self, day, names):
+        """Birthdays on a day for contacts whose timezone is one of names"""
+        people = self.store.birthdays_on(day)
+        return _rows(people, self._zone_mask(people, names))
+
+    def _people_between(self, start, end, names):
+        """(contacts, dates) with birthdays from start to end whose timezone is one of names"""
+        people, dates = self.store.between(start, end)
+        mask = self._zone_mask(people, names)
+        return _rows(people, mask), [when for when, keep in zip(dates, mask) if keep]
+
+    def upcoming(self, days=1, now=None):
+        """Return [(zone key, contacts, dates)] for the next N local days after today in each zone
+
+        Uses the store's date-range index, so tomorrow's list (the default)
+        is known well before its send time.
+        """
+        now = time.time() if now is None else now
+        ahead = []
+        for zone_key, (zone, names) in self.zones().items():
+            today = datetime.fromtimestamp(now, zone).date()
+            people, dates = self._people_between(today + timedelta(days=1),
+                                                 today + timedelta(days=days), names)
+            ahead.append((zone_key, people, dates))
+        return ahead
+
+    def _send_time(self, zone, now):
+        """Return the timestamps of today's and tomorrow's send time in a zone"""
+        local = datetime.fromtimestamp(now, zone)
+        today = datetime.combine(local.date(), self.send_at, tzinfo=zone)
+        tomorrow = datetime.combine(local.date() + timedelta(days=1), self.send_at, tzinfo=zone)
+        return local.date(), today.timestamp(), tomorrow.timestamp()
+
+    def run_due(self, now=None):
+        """Send for every zone whose local send time has passed; return the next wake time"""
+        now = time.time() if now is None else now
+        next_wake = now + self.max_sleep
+        for zone_key, (zone, names) in self.zones().items():
+            day, send_today, send_tomorrow = self._send_time(zone, now)
+            if now < send_today:
+                next_wake = min(next_wake, send_today)
+                continue
+            next_wake = min(next_wake, send_tomorrow)
+
+            handled = self._handled.get((zone_key, day))
+            if handled and handled[0] == self.store.version and (handled[1] is None or now < handled[1]):
+                if handled[1] is not None:
+                    next_wake = min(next_wake, handled[1])
+                continue
+
+            people = self._people_in_zone(day, names)
+            retry_at = None
+            if len(people):
+                print(f"[{datetime.now():%Y-%m-%d %H:%M}] {len(people)} birthday(s) on {day} "
+                      f"in {zone_key or 'local time'}")
+                retry_at = self.run_day(people, day.isoformat())
+                if retry_at is not None:
+                    next_wake = min(next_wake, retry_at)
+            if handled is None:
+                tomorrow = day + timedelta(days=1)
+                ahead, _ = self._people_between(tomorrow, tomorrow, names)
+                if len(ahead):
+                    print(f"Tomorrow: {len(ahead)} birthday(s) on {tomorrow} in {zone_key or 'local time'}")
+            self._handled[(zone_key, day)] = (self.store.version, retry_at)
+            if self.stopping.is_set():
+                break
+        # Every zone's local date is within a day of ours; older days are done
+        oldest = datetime.fromtimestamp(now).date() - timedelta(days=2)
+        for key in [key for key in self._handled if key[1] < oldest]:
+            del self._handled[key]
+        return next_wake
+
+    def run_forever(self):
+        print(f"Birthday scheduler running; sending at {self.send_at:%H:%M} local time")
+        while not self.stopping.is_set():
+            try:
+                next_wake = self.run_due()
+            except Exception as e:
+                print(f"Error in scheduler pass: {str(e)}")
+                next_wake = time.time() + 60
+            delay = max(1.0, next_wake - time.time())
+            self._wake.wait(delay)
+            self._wake.clear()
+        print("Birthday scheduler stopped")
@@ -0,0 +1,194 @@
+import os
+import time
+import sqlite3
+import threading
+
+PENDING = "pending"
+RENDERING = "rendering"
+SENT = "sent"
+FAILED = "failed"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    contact_key  TEXT NOT NULL,
+    day          TEXT NOT NULL,
+    name         TEXT,
+    phone        TEXT,
+    state        TEXT NOT NULL DEFAULT 'pending',
+    attempts     INTEGER NOT NULL DEFAULT 0,
+    next_attempt REAL NOT NULL DEFAULT 0,
+    last_error   TEXT,
+    updated      REAL NOT NULL,
+    owner_pid    INTEGER,
+    lease_until  REAL,
+    PRIMARY KEY (contact_key, day)
+);
+CREATE INDEX IF NOT EXISTS jobs_day_state ON jobs (day, state);
+"""
+# Columns added after the first release, for journals created before them
+ADDED_COLUMNS = (("owner_pid", "INTEGER"), ("lease_until", "REAL"))
+
+
+def _pid_alive(pid):
+    """Whether a process with this id is still running on this machine"""
+    if pid == os.getpid():
+        return True
+    if os.name == "nt":
+        import ctypes
+
+        # OpenProcess fails once the process is gone; os.kill would terminate it
+        handle = ctypes.windll.kernel32.OpenProcess(0x1000, False, pid)
+        if not handle:
+            return False
+        code = ctypes.c_ulong()
+        ctypes.windll.kernel32.GetExitCodeProcess(handle, ctypes.byref(code))
+        ctypes.windll.kernel32.CloseHandle(handle)
+        return code.value == 259  # STILL_ACTIVE
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def contact_key(name, phone):
+    """Stable key for a contact: phone digits plus case-folded name"""
+    digits = "".join(c for c in str(phone) if c.isdigit())
+    return f"{digits}|{str(name).strip().casefold()}"
+
+
+class SendJournal:
+    """SQLite-backed record of who has been wished on which day
+
+    Each (contact, day) moves through pending -> rendering -> sent, or to
+    failed with an exponentially growing wait before the next attempt.
+    Jobs in rendering belong to the process that claimed them until its
+    lease runs out. ``recover`` returns only those whose owner has died or
+    whose lease has expired to pending, so a rerun processes the unfinished
+    tail of a crashed run without touching a run that is still going, and
+    never re-sends what is already marked sent.
+    """
+
+    def __init__(self, path="send_journal.db", base_backoff=60.0, max_backoff=3600.0, max_attempts=5,
+                 lease=6 * 3600.0):
+        self.path = path
+        self.lease = lease
+        self.base_backoff = base_backoff
+        self.max_backoff = max_backoff
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(SCHEMA)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(jobs)")}
+        with self._db:
+            for name, kind in ADDED_COLUMNS:
+                if name not in columns:
+                    self._db.execute(f"ALTER TABLE jobs ADD COLUMN {name} {kind}")
+
+    def close(self):
+        self._db.close()
+
+    def _execute(self, sql, params=()):
+        with self._lock, self._db:
+            return self._db.execute(sql, params)
+
+    def enqueue(self, day, contacts):
+        """Record (key, name, phone) contacts as pending for a day, once each"""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.executemany(
+                "INSERT OR IGNORE INTO jobs (contact_key, day, name, phone, updated) "
+                "VALUES (?, ?, ?, ?, ?)",
+                [(key, day, str(name), str(phone), now) for key, name, phone in contacts])
+
+    def recover(self):
+        """Return jobs left in rendering by a dead process, or whose lease has
+        expired, to pending; returns how many"""
+        now = time.time()
+        with self._lock, self._db:
+            rows = self._db.execute(
+                "SELECT contact_key, day, owner_pid, lease_until FROM jobs WHERE state = ?",
+                (RENDERING,)).fetchall()
+            orphans = [(key, day) for key, day, pid, lease_until in rows
+                       if pid is None or lease_until is None or lease_until <= now
+                       or not _pid_alive(pid)]
+            self._db.executemany(
+                "UPDATE jobs SET state = ?, owner_pid = NULL, lease_until = NULL, updated = ? "
+                "WHERE contact_key = ? AND day = ? AND state = ?",
+                [(PENDING, now, key, day, RENDERING) for key, day in orphans])
+        return len(orphans)
+
+    def due(self, day, now=None):
+        """Return keys of jobs for a day that should be attempted now"""
+        now = time.time() if now is None else now
+        rows = self._execute(
+            "SELECT contact_key FROM jobs WHERE day = ? AND state IN (?, ?) "
+            "AND attempts < ? AND next_attempt <= ?",
+            (day, PENDING, FAILED, self.max_attempts, now)).fetchall()
+        return {row[0] for row in rows}
+
+    def claim(self, day, keys, now=None):
+        """Claim the due jobs among keys for this process until the lease runs out
+
+        Each job moves to rendering only if it is still due, in one
+        transaction, so of two runs racing for a job exactly one gets it.
+        Returns the keys this call claimed; send only those.
+        """
+        now = time.time() if now is None else now
+        pid = os.getpid()
+        claimed = set()
+        with self._lock, self._db:
+            for key in keys:
+                cursor = self._db.execute(
+                    "UPDATE jobs SET state = ?, owner_pid = ?, lease_until = ?, updated = ? "
+                    "WHERE contact_key = ? AND day = ? AND state IN (?, ?) "
+                    "AND attempts < ? AND next_attempt <= ?",
+                    (RENDERING, pid, now + self.lease, now, key, day, PENDING, FAILED,
+                     self.max_attempts, now))
+                if cursor.rowcount:
+                    claimed.add(key)
+        return claimed
+
+    def mark_sent(self, day, key):
+        self._execute(
+            "UPDATE jobs SET state = ?, attempts = attempts + 1, last_error = NULL, updated = ? "
+            "WHERE contact_key = ? AND day = ?",
+            (SENT, time.time(), key, day))
+
+    def mark_failed(self, day, key, error):
+        """Record a failure and schedule the next attempt with exponential backoff"""
+        now = time.time()
+        with self._lock, self._db:
+            row = self._db.execute(
+                "SELECT attempts FROM jobs WHERE contact_key = ? AND day = ?", (key, day)).fetchone()
+            attempts = (row[0] if row else 0) + 1
+            delay = min(self.max_backoff, self.base_backoff * 2 ** (attempts - 1))
+            self._db.execute(
+                "UPDATE jobs SET state = ?, attempts = ?, next_attempt = ?, last_error = ?, updated = ? "
+                "WHERE contact_key = ? AND day = ?",
+                (FAILED, attempts, now + delay, str(error), now, key, day))
+
+    def release(self, day, keys):
+        """Put jobs back to pending without counting an attempt (e.g. cancelled)"""
+        now = time.time()
+        with self._lock, self._db:
+            self._db.executemany(
+                "UPDATE jobs SET state = ?, updated = ? WHERE contact_key = ? AND day = ? AND state = ?",
+                [(PENDING, now, key, day, RENDERING) for key in keys])
+
+    def summary(self, day):
+        """Return a {state: count} summary for a day"""
+        rows = self._execute(
+            "SELECT state, COUNT(*) FROM jobs WHERE day = ? GROUP BY state", (day,)).fetchall()
+        return dict(rows)
+
+    def next_retry(self, day):
+        """Return the earliest scheduled retry time for a day, or None"""
+        row = self._execute(
+            "SELECT MIN(next_attempt) FROM jobs WHERE day = ? AND state = ? AND attempts < ?",
+            (day, FAILED, self.max_attempts)).fetchone()
+        return row[0] if row else None
@@ -0,0 +1,120 @@
+import os
+import queue
+import hashlib
+import threading
+from PIL import Image
+
+THUMB_SIZE = (200, 150)
+
+
+def make_thumbnail(path, size=THUMB_SIZE):
+    """Decode a template at reduced size and fit it onto a size-sized tile"""
+    with Image.open(path) as img:
+        # Lets JPEG decode straight to a smaller scale; no-op for PNG
+        img.draft("RGB", size)
+        img.thumbnail(size, Image.Resampling.LANCZOS)
+        img = img.convert("RGBA")
+    tile = Image.new("RGBA", size, (0, 0, 0, 0))
+    tile.paste(img, ((size[0] - img.width) // 2, (size[1] - img.height) // 2))
+    return tile
+
+
+class ThumbnailCache:
+    """On-disk cache of pre-scaled template previews
+
+    Entries are keyed by the template's absolute path, mtime and size, so
+    editing or replacing a template produces a new entry. ``prune`` removes
+    entries that no longer match any current template.
+    """
+
+    def __init__(self, cache_dir, size=THUMB_SIZE):
+        self.cache_dir = cache_dir
+        self.size = size
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def _key(self, path):
+        st = os.stat(path)
+        raw = f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}|{self.size[0]}x{self.size[1]}"
+        return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+    def _entry_path(self, key):
+        return os.path.join(self.cache_dir, key + ".png")
+
+    def get(self, path):
+        """Return the preview for a template, generating it on a cache miss"""
+        entry = self._entry_path(self._key(path))
+        try:
+            with Image.open(entry) as cached:
+                cached.load()
+                return cached
+        except (FileNotFoundError, OSError):
+            pass
+
+        thumb = make_thumbnail(path, self.size)
+        # Write to a temp name first so a crash never leaves a partial entry
+        tmp_path = f"{entry}.{os.getpid()}.tmp"
+        try:
+            thumb.save(tmp_path, "PNG")
+            os.replace(tmp_path, entry)
+        except OSError as e:
+            print(f"Error caching thumbnail for {path}: {str(e)}")
+        return thumb
+
+    def prune(self, paths):
+        """Delete cached previews that do not belong to any of the given templates"""
+        keep = set()
+        for path in paths:
+            try:
+                keep.add(os.path.basename(self._entry_path(self._key(path))))
+            except FileNotFoundError:
+                pass
+        for entry in os.listdir(self.cache_dir):
+            if entry not in keep:
+                try:
+                    os.remove(os.path.join(self.cache_dir, entry))
+                except OSError:
+                    pass
+
+
+class ThumbnailLoader:
+    """Load previews on a worker thread and hand them back through a queue
+
+    Results arrive on ``results`` as (path, image, error) tuples for the Tk
+    thread to poll with ``after()``; no Tk calls are made off that thread.
+    ``prioritize`` moves the given templates to the front of the queue, so
+    whatever is scrolled into view is decoded next.
+    """
+
+    def __init__(self, cache, paths):
+        self.cache = cache
+        self.results = queue.Queue()
+        self._pending = list(paths)
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        """Stop after the template currently being decoded"""
+        self._stopped.set()
+
+    def prioritize(self, paths):
+        """Move still-pending templates to the front, keeping their order"""
+        with self._lock:
+            wanted = [p for p in paths if p in self._pending]
+            if wanted:
+                rest = [p for p in self._pending if p not in set(wanted)]
+                self._pending = wanted + rest
+
+    def _run(self):
+        while not self._stopped.is_set():
+            with self._lock:
+                if not self._pending:
+                    return
+                path = self._pending.pop(0)
+            try:
+                self.results.put((path, self.cache.get(path), None))
+            except Exception as e:
+                self.results.put((path, None, e))
@@ -0,0 +1,234 @@
+import json
+import time
+import random
+import argparse
+import threading
+import http.client
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class TransportError(Exception):
+    """A message could not be delivered"""
+
+
+class RateLimited(TransportError):
+    """The provider asked us to slow down"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class Transport:
+    """Delivers a birthday message together with its card"""
+
+    name = "transport"
+
+    def send(self, phone, message, card):
+        """Deliver one message, raising TransportError on failure"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+
+class PyWhatKitTransport(Transport):
+    """Sends through WhatsApp Web by driving a browser with pywhatkit"""
+
+    name = "pywhatkit"
+
+    def __init__(self, spool, wait_time=15, pause=0):
+        self.spool = spool
+        self.wait_time = wait_time
+        self.pause = pause
+
+    def send(self, phone, message, card):
+        # Imported here: pywhatkit is slow to import and reaches for a browser
+        import pywhatkit
+
+        # pywhatkit needs a real file, so the card only touches the private spool
+        image_path = self.spool.materialize(card)
+        try:
+            pywhatkit.sendwhats_image(str(phone), image_path, message, wait_time=self.wait_time)
+        except Exception as e:
+            raise TransportError(str(e)) from e
+        finally:
+            self.spool.release(image_path)
+        if self.pause:
+            time.sleep(self.pause)
+
+
+def parse_retry_after(value):
+    """Seconds to wait from a Retry-After header, in either the delay-seconds
+    or the HTTP-date form; None when absent or unreadable"""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        when = parsedate_to_datetime(value)
+    except (TypeError, ValueError, IndexError):
+        return None
+    if when.tzinfo is None:
+        when = when.replace(tzinfo=timezone.utc)
+    return max(0.0, (when - datetime.now(timezone.utc)).total_seconds())
+
+
+class HttpTransport(Transport):
+    """POSTs each card to an HTTP endpoint
+
+    The encoded card is the request body; phone and message travel as
+    query parameters. 429 responses raise RateLimited with the server's
+    Retry-After, other non-2xx responses raise TransportError.
+    """
+
+    name = "http"
+
+    def __init__(self, url, timeout=30, token=None):
+        self.url = url
+        self.timeout = timeout
+        self.token = token
+
+    def send(self, phone, message, card):
+        query = urllib.parse.urlencode({"phone": str(phone), "message": message, "name": card.name})
+        request = urllib.request.Request(f"{self.url}?{query}", data=card.data, method="POST")
+        request.add_header("Content-Type", f"image/{card.extension}")
+        if self.token:
+            request.add_header("Authorization", f"Bearer {self.token}")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                response.read()
+        except urllib.error.HTTPError as e:
+            if e.code == 429:
+                raise RateLimited(f"HTTP 429 from {self.url}",
+                                  parse_retry_after(e.headers.get("Retry-After"))) from e
+            raise TransportError(f"HTTP {e.code} from {self.url}") from e
+        except (urllib.error.URLError, http.client.HTTPException, OSError) as e:
+            raise TransportError(str(e)) from e
+
+
+class _FakeHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        server = self.server.fake
+        length = int(self.headers.get("Content-Length", 0))
+        self.rfile.read(length)
+        status, retry_after = server.handle_message(length)
+        self.send_response(status)
+        if retry_after is not None:
+            self.send_header("Retry-After", f"{retry_after:.3f}")
+        body = json.dumps({"status": status}).encode("utf-8")
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class FakeServer:
+    """Local stand-in for a messaging provider, for headless load tests
+
+    Simulates per-message latency (with jitter), random failures and a
+    global rate limit answered with HTTP 429 and Retry-After. Point an
+    HttpTransport at ``url`` to exercise the full send pipeline.
+    """
+
+    def __init__(self, host="127.0.0.1", port=0, latency=0.2, jitter=0.05,
+                 failure_rate=0.0, rate_limit=None, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.failure_rate = failure_rate
+        self.rate_limit = rate_limit
+        self.stats = {"received": 0, "delivered": 0, "failed": 0, "limited": 0, "bytes": 0}
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        # Rates below one a second still let a whole message through
+        self.burst = max(1.0, rate_limit) if rate_limit else 0.0
+        self._tokens = self.burst
+        self._refilled = time.monotonic()
+        self._httpd = ThreadingHTTPServer((host, port), _FakeHandler)
+        self._httpd.daemon_threads = True
+        self._httpd.fake = self
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}/send"
+
+    def _take_token(self):
+        """Return None if a message may pass, else seconds until one may"""
+        if not self.rate_limit:
+            return None
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._refilled) * self.rate_limit)
+        self._refilled = now
+        if self._tokens >= 1:
+            self._tokens -= 1
+            return None
+        return (1 - self._tokens) / self.rate_limit
+
+    def handle_message(self, size):
+        """Decide the fate of one incoming message; returns (status, retry_after)"""
+        with self._lock:
+            self.stats["received"] += 1
+            self.stats["bytes"] += size
+            retry_after = self._take_token()
+            if retry_after is not None:
+                self.stats["limited"] += 1
+                return 429, retry_after
+            delay = max(0.0, self.latency + self._random.uniform(-self.jitter, self.jitter))
+            failed = self._random.random() < self.failure_rate
+        time.sleep(delay)
+        with self._lock:
+            self.stats["failed" if failed else "delivered"] += 1
+        return (503 if failed else 200), None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the fake messaging provider")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--latency", type=float, default=0.2, help="seconds per message")
+    parser.add_argument("--jitter", type=float, default=0.05)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=float, default=None, help="messages per second")
+    args = parser.parse_args()
+
+    server = FakeServer(args.host, args.port, args.latency, args.jitter,
+                        args.failure_rate, args.rate_limit)
+    print(f"Fake provider listening on {server.url}")
+    try:
+        server._httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        print(f"Stats: {server.stats}")
+        server._httpd.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+from bisect import bisect_left
+
+
+def _longest_increasing(items, key):
+    """Return the longest subsequence of items whose keys are increasing"""
+    tails = []       # smallest tail key for each subsequence length
+    tail_items = []  # index into items for each entry in tails
+    previous = [None] * len(items)
+    for i, item in enumerate(items):
+        k = key[item]
+        pos = bisect_left(tails, k)
+        if pos == len(tails):
+            tails.append(k)
+            tail_items.append(i)
+        else:
+            tails[pos] = k
+            tail_items[pos] = i
+        previous[i] = tail_items[pos - 1] if pos else None
+    result = []
+    i = tail_items[-1] if tail_items else None
+    while i is not None:
+        result.append(items[i])
+        i = previous[i]
+    return result[::-1]
+
+
+class TreeBinding:
+    """Keep a ttk.Treeview in sync with a list of (id, values) rows
+
+    Each update is diffed against the rows already shown: only missing rows
+    are inserted, vanished rows deleted and changed rows re-valued. Rows
+    that changed position are moved with ``Treeview.move``; the longest run
+    of rows already in the right relative order stays where it is. Work is
+    applied in batches so large updates do not block the Tk main loop.
+    """
+
+    def __init__(self, tree, batch_size=500):
+        self.tree = tree
+        self.batch_size = batch_size
+        self._values = {}
+        self._ops = []
+        self._detached = set()
+        self._job = None
+
+    def update(self, rows):
+        """Show rows, an iterable of (id, values) in display order"""
+        self._cancel()
+        rows = [(str(iid), tuple(values)) for iid, values in rows]
+        position = {iid: i for i, (iid, _) in enumerate(rows)}
+
+        current = self.tree.get_children("")
+        stale = [iid for iid in current if iid not in position]
+        for start in range(0, len(stale), self.batch_size):
+            self.tree.delete(*stale[start:start + self.batch_size])
+        for iid in stale:
+            self._values.pop(iid, None)
+
+        kept = [iid for iid in current if iid in position]
+        stable = set(_longest_increasing(kept, position))
+        moved = [iid for iid in kept if iid not in stable]
+        for start in range(0, len(moved), self.batch_size):
+            self.tree.detach(*moved[start:start + self.batch_size])
+        self._detached = set(moved)
+
+        # With the moved rows detached, the stable rows are already in
+        # display order, so walking the new order and placing everything
+        # else at its target index keeps the tree consistent.
+        ops = []
+        for index, (iid, values) in enumerate(rows):
+            if iid in stable:
+                if self._values.get(iid) != values:
+                    ops.append(("values", index, iid, values))
+            elif iid in self._detached:
+                ops.append(("move", index, iid, values))
+            else:
+                ops.append(("insert", index, iid, values))
+        self._ops = ops
+        self._ops.reverse()
+        self._apply()
+
+    def _apply(self):
+        self._job = None
+        for _ in range(min(self.batch_size, len(self._ops))):
+            op, index, iid, values = self._ops.pop()
+            if op == "insert":
+                self.tree.insert("", index, iid=iid, values=values)
+            else:
+                if op == "move":
+                    self.tree.move(iid, "", index)
+                    self._detached.discard(iid)
+                if self._values.get(iid) != values:
+                    self.tree.item(iid, values=values)
+            self._values[iid] = values
+        if self._ops:
+            self._job = self.tree.after(1, self._apply)
+
+    def _cancel(self):
+        """Drop any batches still pending from the previous update"""
+        if self._job is not None:
+            self.tree.after_cancel(self._job)
+            self._job = None
+        self._ops = []
+        if self._detached:
+            # Rows that never got re-attached are not in get_children() any
+            # more, so remove them here instead of leaking them
+            detached = list(self._detached)
+            for start in range(0, len(detached), self.batch_size):
+                self.tree.delete(*detached[start:start + self.batch_size])
+            for iid in detached:
+                self._values.pop(iid, None)
+            self._detached = set()
@@ -0,0 +1,46 @@
+import queue
+
+
+class EventPump:
+    """Hands work from background threads to the Tk main loop
+
+    Tk widgets may only be touched from the thread running ``mainloop``.
+    Worker threads call ``post(callback, *args)``; the pump drains the
+    queue on a ``root.after`` timer and runs at most ``max_per_tick``
+    callbacks per tick, so a flood of progress events never starves
+    redraws or user input.
+    """
+
+    def __init__(self, root, interval=50, max_per_tick=200):
+        self.root = root
+        self.interval = interval
+        self.max_per_tick = max_per_tick
+        self._queue = queue.SimpleQueue()
+        self._job = None
+
+    def post(self, callback, *args):
+        """Queue ``callback(*args)`` to run on the Tk thread; safe from any thread"""
+        self._queue.put((callback, args))
+
+    def start(self):
+        if self._job is None:
+            self._job = self.root.after(self.interval, self._drain)
+
+    def stop(self):
+        if self._job is not None:
+            self.root.after_cancel(self._job)
+            self._job = None
+
+    def _drain(self):
+        for _ in range(self.max_per_tick):
+            try:
+                callback, args = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            try:
+                callback(*args)
+            except Exception as e:
+                print(f"Error handling UI event: {str(e)}")
+        # Come straight back if there is a backlog, otherwise poll at the interval
+        delay = 1 if not self._queue.empty() else self.interval
+        self._job = self.root.after(delay, self._drain)
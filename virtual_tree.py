@@ -0,0 +1,154 @@
+import tkinter as tk
+from tkinter import ttk
+from tree_binding import TreeBinding
+
+
+class VirtualTree:
+    """Show a very long list in a ttk.Treeview by materializing only a window
+
+    ``fetch(start, stop)`` returns the (id, values) rows for positions
+    ``start:stop`` of the backing list, and ``count`` is its length. Only
+    the rows that fit in the widget, plus ``overscan`` spare rows below,
+    exist as Treeview items. Scrolling, via the scrollbar, the mouse wheel
+    or the keyboard, fetches the new window and lets a TreeBinding add and
+    remove just the rows that changed. The scrollbar is driven by the row
+    count, not by the items in the widget. The selection is tracked by
+    row id, so it survives rows scrolling out of view.
+    """
+
+    def __init__(self, tree, scrollbar=None, overscan=5, row_height=None):
+        self.tree = tree
+        self.scrollbar = scrollbar
+        self.overscan = overscan
+        self.row_height = row_height
+        self.count = 0
+        self.top = 0
+        self._fetch = lambda start, stop: []
+        self._rows = TreeBinding(tree)
+        self._selected = set()
+        self._shown = set()
+
+        if scrollbar is not None:
+            scrollbar.configure(command=self.yview)
+        tree.bind("<Configure>", lambda e: self.render())
+        tree.bind("<<TreeviewSelect>>", self._on_select, add="+")
+        tree.bind("<MouseWheel>", self._on_wheel)
+        tree.bind("<Button-4>", lambda e: self.scroll(-3) or "break")
+        tree.bind("<Button-5>", lambda e: self.scroll(3) or "break")
+        tree.bind("<Up>", lambda e: self._step(-1))
+        tree.bind("<Down>", lambda e: self._step(1))
+        tree.bind("<Prior>", lambda e: self.scroll(-self.visible_rows()) or "break")
+        tree.bind("<Next>", lambda e: self.scroll(self.visible_rows()) or "break")
+        tree.bind("<Home>", lambda e: self.scroll_to(0) or "break")
+        tree.bind("<End>", lambda e: self.scroll_to(self.count) or "break")
+
+    def set_source(self, count, fetch, keep_position=True):
+        """Point the view at a new backing list and redraw"""
+        self.count = count
+        self._fetch = fetch
+        if not keep_position:
+            self.top = 0
+        self.render()
+
+    def visible_rows(self):
+        """How many rows fit in the widget at its current size"""
+        row_height = self.row_height or self._measure_row_height()
+        children = self.tree.get_children("")
+        header = 0
+        if children:
+            box = self.tree.bbox(children[0])
+            header = box[1] if box else 0
+        height = self.tree.winfo_height() - header
+        return max(1, height // row_height)
+
+    def _measure_row_height(self):
+        try:
+            height = int(ttk.Style().lookup("Treeview", "rowheight") or 0)
+        except (tk.TclError, ValueError):
+            height = 0
+        if not height:
+            children = self.tree.get_children("")
+            box = self.tree.bbox(children[0]) if children else None
+            height = box[3] if box else 20
+        return height
+
+    def render(self):
+        """Materialize the rows for the current scroll position"""
+        visible = self.visible_rows()
+        self.top = max(0, min(self.top, self.count - visible))
+        stop = min(self.count, self.top + visible + self.overscan)
+        rows = [(str(iid), values) for iid, values in self._fetch(self.top, stop)]
+        self._shown = {iid for iid, _ in rows}
+        self._rows.update(rows)
+        # The widget never scrolls itself; the window is moved instead
+        self.tree.yview_moveto(0)
+        wanted = [iid for iid in self._selected if iid in self._shown]
+        if set(wanted) != set(self.tree.selection()):
+            self.tree.selection_set(wanted)
+        if self.scrollbar is not None:
+            if self.count:
+                self.scrollbar.set(self.top / self.count, min(1.0, (self.top + visible) / self.count))
+            else:
+                self.scrollbar.set(0, 1)
+
+    def scroll_to(self, top):
+        self.top = top
+        self.render()
+
+    def scroll(self, rows):
+        self.scroll_to(self.top + rows)
+
+    def yview(self, *args):
+        """Scrollbar command: 'moveto fraction' or 'scroll n units|pages'"""
+        if not args:
+            return
+        if args[0] == "moveto":
+            self.scroll_to(int(float(args[1]) * self.count))
+        elif args[0] == "scroll":
+            amount = int(args[1])
+            if args[2] == "pages":
+                amount *= self.visible_rows()
+            self.scroll(amount)
+
+    def _on_wheel(self, event):
+        # Windows reports multiples of 120 per notch, macOS small deltas
+        notches = event.delta // 120 if abs(event.delta) >= 120 else event.delta
+        self.scroll(-3 * notches)
+        return "break"
+
+    def _step(self, direction):
+        """Move the focus a row, scrolling the window at its edges"""
+        children = self.tree.get_children("")
+        focus = self.tree.focus()
+        if not children or focus not in children:
+            return None
+        index = children.index(focus)
+        last_visible = min(len(children), self.visible_rows()) - 1
+        if (direction < 0 and index > 0) or (direction > 0 and index < last_visible):
+            return None
+        before = self.top
+        self.scroll(direction)
+        if self.top == before:
+            return "break"
+        children = self.tree.get_children("")
+        target = children[index] if index < len(children) else children[-1]
+        self.tree.focus(target)
+        self._selected = {target}
+        self.tree.selection_set(target)
+        return "break"
+
+    def _on_select(self, event=None):
+        current = set(self.tree.selection())
+        # Ignore the event from restoring the selection after a scroll, so
+        # rows selected earlier and now out of view stay selected
+        if current == {iid for iid in self._selected if iid in self._shown}:
+            return
+        self._selected = current
+
+    def selection(self):
+        """Ids of the selected rows, including ones scrolled out of view"""
+        return tuple(self._selected)
+
+    def clear_selection(self):
+        self._selected = set()
+        self.tree.selection_set([])